@@ -0,0 +1,73 @@
+import argparse
+import os
+import re
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from bench_pipeline import timed
+from corpus import synthetic_document
+from functions import markdown_to_blocks, block_to_block_type, extract_markdown_images, extract_markdown_links
+from textnode import BlockType
+
+# The classifier and extractors as they were before the table-driven
+# rewrite, kept here as the reference the micro-benchmarks compare against
+def reference_block_to_block_type(blocks):
+    parts = blocks.split("\n")
+    if blocks.startswith("```") and blocks.endswith("```"):
+        return BlockType.CODE
+    if re.match(r"^#{1,6} .+\S$", parts[0]):
+        return BlockType.HEADING
+    all_quote, all_ul, all_ol = True, True, True
+    for idx, line in enumerate(parts, start=1):
+        all_quote &= line.startswith(">")
+        all_ul &= line.startswith("- ")
+        j = 0
+        while j < len(line) and line[j].isdigit():
+            j += 1
+        if j == 0:
+            all_ol = False
+        else:
+            all_ol &= j + 1 < len(line) and line[j:j + 2] == ". " and int(line[:j]) == idx
+    if all_quote:
+        return BlockType.QUOTE
+    if all_ul:
+        return BlockType.UNORDERED_LIST
+    if all_ol:
+        return BlockType.ORDERED_LIST
+    return BlockType.PARAGRAPH
+
+def reference_extract_images(text):
+    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+
+def reference_extract_links(text):
+    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for block classification and link extraction")
+    parser.add_argument("--sections", type=int, default=1000, help="sections in the document (about 6 blocks each)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    blocks = markdown_to_blocks(synthetic_document(args.sections))
+    for block in blocks:
+        if block_to_block_type(block) != reference_block_to_block_type(block):
+            raise Exception(f"Classification differs for block: {block[:60]!r}")
+    print(f"{len(blocks)} blocks")
+
+    pairs = [
+        ("block_to_block_type", lambda: [reference_block_to_block_type(b) for b in blocks],
+         lambda: [block_to_block_type(b) for b in blocks]),
+        ("extract_markdown_images", lambda: [reference_extract_images(b) for b in blocks],
+         lambda: [extract_markdown_images(b) for b in blocks]),
+        ("extract_markdown_links", lambda: [reference_extract_links(b) for b in blocks],
+         lambda: [extract_markdown_links(b) for b in blocks]),
+    ]
+    for name, reference, current in pairs:
+        before = timed(reference, args.repeat)["min"]
+        after = timed(current, args.repeat)["min"]
+        print(f"{name:<26} reference {before * 1000:9.2f} ms   current {after * 1000:9.2f} ms   {before / after:6.2f}x")
+
+if __name__ == "__main__":
+    main()
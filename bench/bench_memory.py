@@ -0,0 +1,77 @@
+import os
+import io
+import sys
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from corpus import synthetic_document
+from functions import markdown_to_html_node, tokenize_inline, generate_page
+from htmlnode import LeafNode, ParentNode
+from textnode import TextNode, TextType
+
+NODE_COUNT = 100_000
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        count += 1
+        if isinstance(item, ParentNode):
+            stack.extend(item.children)
+    return count
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+def per_node(label, build):
+    nodes, size = measure(build)
+    print(f"{label:<12} {size / len(nodes):8.1f} bytes/node")
+
+def peak_page_memory(source, template, threshold):
+    output = source + ".html"
+    tracemalloc.start()
+    with redirect_stdout(io.StringIO()):
+        generate_page(source, template, "/", output, streaming_threshold=threshold)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def streaming_peaks(sections=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "big.md")
+        template = os.path.join(tmp, "template.html")
+        with open(source, "w") as f:
+            f.write(synthetic_document(sections=sections))
+        with open(template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        size = os.path.getsize(source)
+        in_memory = peak_page_memory(source, template, threshold=size + 1)
+        streaming = peak_page_memory(source, template, threshold=0)
+    print(f"{'page':<12} {size / 1024 / 1024:.1f} MB source: peak {in_memory / 1024 / 1024:.1f} MB in memory, "
+          f"{streaming / 1024 / 1024:.2f} MB streaming")
+
+def main():
+    per_node("TextNode", lambda: [TextNode("x", TextType.BOLD) for _ in range(NODE_COUNT)])
+    per_node("LeafNode", lambda: [LeafNode("b", "x") for _ in range(NODE_COUNT)])
+    per_node("ParentNode", lambda: [ParentNode("p", []) for _ in range(NODE_COUNT)])
+
+    markdown = synthetic_document(sections=200)
+    text_nodes, size = measure(lambda: tokenize_inline(markdown.replace("\n", " ")))
+    print(f"{'inline':<12} {size / len(text_nodes):8.1f} bytes/node over {len(text_nodes)} TextNodes")
+    tree, size = measure(lambda: markdown_to_html_node(markdown))
+    nodes = count_nodes(tree)
+    print(f"{'document':<12} {size / nodes:8.1f} bytes/node over {nodes} HTML nodes ({size / 1024 / 1024:.1f} MB)")
+    streaming_peaks()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from corpus import synthetic_document, write_corpus
+from functions import (markdown_to_blocks, scan_blocks, block_to_block_type, split_nodes_delimiter, split_nodes_image,
+                       split_nodes_link, tokenize_inline, markdown_to_html_node, generate_pages_recursive)
+from textnode import TextNode, TextType
+
+TEMPLATE = "<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>"
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"min": min(samples), "median": statistics.median(samples), "repeat": repeat}
+
+def split_chain(text):
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    return split_nodes_link(split_nodes_image(nodes))
+
+def inline_texts(blocks):
+    texts = []
+    for block in blocks:
+        if block_to_block_type(block).value == "p":
+            texts.append(block.replace("\n", " "))
+    return texts
+
+def run_stages(markdown, repeat):
+    blocks = markdown_to_blocks(markdown)
+    texts = inline_texts(blocks)
+    tree = markdown_to_html_node(markdown)
+    return {
+        "markdown_to_blocks": timed(lambda: markdown_to_blocks(markdown), repeat),
+        "scan_blocks": timed(lambda: list(scan_blocks(markdown.split("\n"))), repeat),
+        "block_to_block_type": timed(lambda: [block_to_block_type(block) for block in blocks], repeat),
+        "inline_split_chain": timed(lambda: [split_chain(text) for text in texts], repeat),
+        "inline_tokenize": timed(lambda: [tokenize_inline(text) for text in texts], repeat),
+        "markdown_to_html_node": timed(lambda: markdown_to_html_node(markdown), repeat),
+        "to_html": timed(tree.to_html, repeat),
+    }
+
+def run_end_to_end(pages, sections, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.path.join(tmp, "content")
+        template = os.path.join(tmp, "template.html")
+        write_corpus(content, pages, sections)
+        with open(template, "w") as f:
+            f.write(TEMPLATE)
+
+        def build():
+            with redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content, template, "/", os.path.join(tmp, "docs"))
+        return timed(build, repeat)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["stages"]
+    print(f"\nCompared with {baseline_path}:")
+    for name, stats in results["stages"].items():
+        if name in baseline:
+            ratio = stats["min"] / baseline[name]["min"]
+            print(f"  {name:<24} {ratio:6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the markdown to HTML pipeline")
+    parser.add_argument("--sections", type=int, default=200, help="sections in the single-document stages")
+    parser.add_argument("--pages", type=int, default=100, help="pages in the end-to-end build")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", metavar="JSON", help="print speed ratios against an earlier result file")
+    args = parser.parse_args()
+
+    markdown = synthetic_document(args.sections)
+    stages = run_stages(markdown, args.repeat)
+    stages["generate_pages_recursive"] = run_end_to_end(args.pages, 10, max(1, args.repeat // 2))
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corpus": {"sections": args.sections, "bytes": len(markdown), "pages": args.pages},
+        "stages": stages,
+    }
+    for name, stats in stages.items():
+        print(f"{name:<26} min {stats['min'] * 1000:9.2f} ms   median {stats['median'] * 1000:9.2f} ms")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import random
+
+WORDS = (
+    "the ring of power was forged in the fires of mount doom by sauron "
+    "while elves dwarves and men kept their own rings in hidden halls"
+).split()
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def inline_paragraph(rng, index, sentences=6):
+    parts = []
+    for i in range(sentences):
+        parts.append(
+            f"{_words(rng, 6).capitalize()} **{_words(rng, 2)}** and _{_words(rng, 2)}_ "
+            f"with `code{i}` near [a link](/blog/post-{index}-{i}) "
+            f"and ![an image](/images/img-{index}-{i}.png) {_words(rng, 5)}."
+        )
+    return "\n".join(parts)
+
+def long_list(rng, items=40, ordered=False):
+    lines = []
+    for i in range(1, items + 1):
+        marker = f"{i}." if ordered else "-"
+        lines.append(f"{marker} {_words(rng, 4)} **{_words(rng, 1)}** [ref](/ref/{i})")
+    return "\n".join(lines)
+
+def code_block(rng, lines=60):
+    body = "\n".join(f"    value_{i} = compute({_words(rng, 2)!r})" for i in range(lines))
+    return f"```\n{body}\n```"
+
+def synthetic_document(sections=50, seed=0):
+    rng = random.Random(seed)
+    blocks = ["# Synthetic benchmark page"]
+    for i in range(sections):
+        blocks.append(f"## Section {i}")
+        blocks.append(inline_paragraph(rng, i))
+        blocks.append(long_list(rng, ordered=i % 2 == 1))
+        blocks.append("> " + _words(rng, 12) + "\n> " + _words(rng, 12))
+        if i % 5 == 0:
+            blocks.append(code_block(rng))
+    return "\n\n".join(blocks)
+
+def write_corpus(content_dir, pages=200, sections=10, seed=0):
+    for i in range(pages):
+        section = os.path.join(content_dir, "blog", f"post-{i}")
+        os.makedirs(section, exist_ok=True)
+        with open(os.path.join(section, "index.md"), "w") as f:
+            f.write(synthetic_document(sections, seed + i))
+    with open(os.path.join(content_dir, "index.md"), "w") as f:
+        f.write(synthetic_document(sections, seed))
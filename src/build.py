@@ -0,0 +1,498 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from functions import (reset_output_dir, collect_pages, pages_from_files, output_path_for, generate_page, remove_output,
+                       set_image_attributes, STREAMING_THRESHOLD)
+from fileindex import FileIndex
+from frontmatter import load_metadata
+from images import process_images, changed_images
+from iopipeline import IOPipeline, DEFAULT_IO_THREADS, make_output_dirs
+from parsecache import ParseCache
+from profiler import PROFILER
+from staticsync import collect_static, sync_static, sync_file, signature, is_minified, minify_file
+from minify import Minifier
+from manifest import CACHE_DIR, MANIFEST_PATH, hash_file, new_manifest, load_manifest, save_manifest, full_rebuild_reason
+from depgraph import DepGraph, current_hash
+from feeds import write_feeds
+from links import check_links, output_url
+from taxonomy import write_taxonomies, taxonomy_outputs
+
+PARSE_CACHE_DIR = os.path.join(CACHE_DIR, "parse")
+
+def _images_reason(entry, resized):
+    # The links a page recorded include the src of every image it shows
+    if resized and entry is not None and any(url in resized for url, _ in entry.get("links", ())):
+        return "image sizes or variants changed"
+    return None
+
+class BuildError(Exception):
+    def __init__(self, failures):
+        super().__init__(f"{len(failures)} page(s) failed to build")
+        self.failures = failures
+
+_IN_WORKER = False
+
+def _init_worker(profile, trace):
+    global _IN_WORKER
+    _IN_WORKER = True
+    # A forked worker inherits the parent's samples; start from zero
+    PROFILER.reset()
+    if profile:
+        PROFILER.enable(trace)
+
+def _generate_batch_job(batch):
+    # Renders pages in order on this process while an I/O pipeline reads
+    # the next sources and writes the previous outputs
+    jobs, io_threads, images, minifier = batch
+    set_image_attributes(images or {})
+    if minifier is not None:
+        # Count this batch alone, so a worker's copy of the minifier does not
+        # hand back what the parent had counted before pickling it
+        counted, minifier.stats = minifier.stats, {}
+    results = []
+    pipeline = IOPipeline(io_threads, STREAMING_THRESHOLD)
+    try:
+        for job, source in zip(jobs, pipeline.prefetch(job[0] for job in jobs)):
+            path, template_path, basepath, output_path, cache, content_dir = job
+            error = None
+            info = None
+            try:
+                info = generate_page(path, template_path, basepath, output_path, cache, content_dir=content_dir,
+                                     source=source.result(), writer=pipeline, minifier=minifier)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            results.append((path, output_path, error, info))
+    finally:
+        write_errors = pipeline.close()
+    results = [(path, write_errors[output_path], None, False) if error is None and output_path in write_errors
+               else (path, error, info, output_path not in pipeline.unchanged)
+               for path, output_path, error, info in results]
+    profile = PROFILER.snapshot() if _IN_WORKER and PROFILER.enabled else None
+    stats = None
+    if minifier is not None:
+        stats, minifier.stats = minifier.stats, counted
+    return results, profile, stats
+
+def resolve_jobs(jobs):
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+    return jobs
+
+def render_pages(pages, template_path, basepath, jobs=1, cache=None, content_dir=None, io_threads=DEFAULT_IO_THREADS,
+                 images=None, minifier=None):
+    # Returns the failures, per rendered page what generate_page returned
+    # (its dependencies, metadata and links), and the pages whose
+    # output already held the rendered bytes
+    jobs_list = [(path, template_path, basepath, output_path, cache, content_dir) for path, output_path in pages]
+    make_output_dirs(output_path for _, output_path in pages)
+    if jobs == 1 or len(jobs_list) < 2:
+        return _collect_results(map(_generate_batch_job, [(jobs_list, io_threads, images, minifier)]), minifier)
+    workers = min(jobs, len(jobs_list))
+    chunksize = max(1, len(jobs_list) // (workers * 4))
+    batches = [(jobs_list[i:i + chunksize], io_threads, images, minifier) for i in range(0, len(jobs_list), chunksize)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(PROFILER.enabled, PROFILER.trace)) as executor:
+        # map yields batches in submission order, so reporting is deterministic
+        return _collect_results(executor.map(_generate_batch_job, batches), minifier)
+
+def _collect_results(batches, minifier=None):
+    failures = {}
+    rendered = {}
+    unchanged = []
+    for results, profile, stats in batches:
+        if profile is not None:
+            PROFILER.merge(profile)
+        if stats:
+            minifier.merge(stats)
+        for path, error, info, written in results:
+            if error is not None:
+                print(f"Error: failed to generate {path}: {error}")
+                failures[path] = error
+                continue
+            rendered[path] = info
+            if not written:
+                unchanged.append(path)
+    return failures, rendered, unchanged
+
+class Builder:
+    # Holds the build configuration and the manifest between builds, so that
+    # long-running callers (the dev server) can re-render single paths.
+    def __init__(self, content_dir, template_path, static_dir, basepath, dest_dir, manifest_path=MANIFEST_PATH,
+                 jobs=1, cache_dir=PARSE_CACHE_DIR, link_static=True, deps_path=None, io_threads=DEFAULT_IO_THREADS,
+                 site_url="", images=True, minify=False, links="warn", drafts=False):
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.static_dir = static_dir
+        self.basepath = basepath
+        self.dest_dir = dest_dir
+        self.manifest_path = manifest_path
+        self.jobs = resolve_jobs(jobs)
+        self.cache = ParseCache(cache_dir) if cache_dir else None
+        self.link_static = link_static
+        self.io_threads = io_threads
+        self.site_url = site_url
+        self.images = images
+        self.image_cache_dir = os.path.join(os.path.dirname(manifest_path), "images")
+        self.minify = minify
+        # "warn" reports broken internal links, "error" also fails the build
+        self.links = links
+        # Pages with "draft: true" in their front matter are only built on request
+        self.drafts = drafts
+        self.minifier = Minifier(os.path.join(os.path.dirname(manifest_path), "minify")) if minify else None
+        # <img> attributes by src, handed to every render
+        self.image_attributes = {}
+        # The dependency graph lives next to the manifest
+        self.deps_path = deps_path or os.path.join(os.path.dirname(manifest_path), "deps.json")
+        # So is the index of content and static files
+        self.index_path = os.path.join(os.path.dirname(manifest_path), "files.json")
+        self.manifest = None
+        self.graph = None
+
+    def render(self, stale, pages, hashes=None):
+        # stale holds (page, output, reason); records what each rendered page
+        # used and stores its metadata in the manifest's page table. Returns
+        # the failures and the pages rendered to identical bytes.
+        hashes = {} if hashes is None else hashes
+        failures, rendered, unchanged = render_pages([(page, output) for page, output, _ in stale], self.template_path,
+                                                     self.basepath, self.jobs, self.cache, self.content_dir, self.io_threads,
+                                                     self.image_attributes, self.minifier)
+        for page, output, reason in stale:
+            if page not in rendered:
+                continue
+            pages[page]["meta"] = rendered[page]["meta"]
+            pages[page]["links"] = rendered[page]["links"]
+            self.graph.record(output, page, rendered[page]["deps"], reason)
+            for dep in rendered[page]["deps"]:
+                if dep not in hashes:
+                    hashes[dep] = current_hash(dep)
+                self.graph.hashes[dep] = hashes[dep]
+        return failures, unchanged
+
+    def build(self, clean=False):
+        old = load_manifest(self.manifest_path)
+        self.graph = DepGraph.load(self.deps_path)
+        index = FileIndex.load(self.index_path)
+        full_reason = "--clean" if clean else full_rebuild_reason(old, self.basepath, self.minify)
+        if full_reason:
+            print(f"Full rebuild of {self.dest_dir} ({full_reason})")
+            if clean:
+                reset_output_dir(self.dest_dir)
+            # Otherwise existing outputs are compared and kept when identical,
+            # and whatever this build does not produce is swept afterwards
+            old = new_manifest(self.basepath, self.minify)
+            self.graph = DepGraph()
+            full_reason = f"full rebuild ({full_reason})"
+
+        manifest = new_manifest(self.basepath, self.minify)
+        with PROFILER.span("scan"):
+            static_files = index.scan(self.static_dir)
+        manifest["static"] = sync_static(self.static_dir, self.dest_dir, old["static"], link=self.link_static,
+                                         minifier=self.minifier, files=static_files)
+        manifest["images"] = self._process_images(manifest["static"], old.get("images"))
+        resized = changed_images(old.get("images"), manifest["images"])
+
+        stale = []
+        hashes = {}
+        with PROFILER.span("scan"):
+            changed = self.graph.changed(hashes)
+            prefix = os.path.join(self.content_dir, "")
+            for path, output_path in pages_from_files(index.scan(self.content_dir), self.content_dir, self.dest_dir):
+                entry = {"hash": index.hash(self.content_dir, path[len(prefix):]), "output": output_path}
+                previous = old["pages"].get(path)
+                if not self.drafts and self._is_draft(path, entry, previous, old.get("drafts", {}), manifest["drafts"]):
+                    continue
+                reason = full_reason or self._stale_reason(previous, entry, changed) or _images_reason(previous, resized)
+                if reason:
+                    stale.append((path, output_path, reason))
+                if previous is not None and "meta" in previous:
+                    entry["meta"] = previous["meta"]
+                    entry["links"] = previous.get("links", [])
+                manifest["pages"][path] = entry
+
+        failures, unchanged = self.render(stale, manifest["pages"], hashes)
+        for path in failures:
+            # Keep the output owned by the page but force a retry next build
+            manifest["pages"][path]["hash"] = None
+
+        removed = 0
+        if manifest["drafts"]:
+            print(f"Drafts: {len(manifest['drafts'])} page(s) left out (build with --drafts to include them)")
+        for path, entry in old["pages"].items():
+            current = manifest["pages"].get(path)
+            if current is None or current["output"] != entry["output"]:
+                why = "is a draft" if path in manifest["drafts"] else "is gone"
+                print(f"Removing {entry['output']} (source {path} {why})")
+                remove_output(entry["output"], self.dest_dir)
+                self.graph.forget(entry["output"])
+                removed += 1
+        manifest["generated"] = self._write_feeds(manifest["pages"], old.get("generated", []))
+        manifest["taxonomy"] = self._write_taxonomies(manifest["pages"], old.get("taxonomy"))
+        if full_reason and not clean:
+            removed += self._sweep(manifest)
+        broken = self._check_links(manifest)
+
+        self.manifest = manifest
+        save_manifest(manifest, self.manifest_path)
+        self.graph.prune_hashes()
+        self.graph.save(self.deps_path)
+        index.save(self.index_path)
+        if self.cache is not None:
+            self.cache.prune()
+        if self.minifier is not None:
+            self.minifier.cache.prune()
+            self.minifier.report()
+        written = len(stale) - len(failures) - len(unchanged)
+        skipped = len(manifest["pages"]) - len(stale) + len(unchanged)
+        print(f"Pages: {written} written, {skipped} skipped ({len(unchanged)} re-rendered identical), "
+              f"{removed} deleted, {len(failures)} failed")
+        if failures or broken:
+            raise BuildError({**broken, **failures})
+        return manifest
+
+    def _sweep(self, manifest):
+        # Delete outputs left over from before a full rebuild that kept dest
+        keep = {os.path.abspath(entry["output"]) for entry in manifest["pages"].values()}
+        keep.update(os.path.abspath(os.path.join(self.dest_dir, rel)) for rel in manifest["static"])
+        keep.update(os.path.abspath(path) for path in manifest["generated"])
+        keep.update(os.path.abspath(path) for path in taxonomy_outputs(manifest["taxonomy"], self.dest_dir))
+        keep.update(os.path.abspath(path) for path in manifest["images"]["outputs"])
+        orphans = []
+        for root, _, names in os.walk(self.dest_dir):
+            orphans.extend(os.path.join(root, name) for name in names
+                           if os.path.abspath(os.path.join(root, name)) not in keep)
+        for path in sorted(orphans):
+            print(f"Removing {path} (not produced by this build)")
+            remove_output(path, self.dest_dir)
+        return len(orphans)
+
+    def _process_images(self, static, old_images):
+        if not self.images:
+            self.image_attributes = {}
+            return {"sources": {}, "outputs": [], "attributes": {}}
+        images = process_images(self.static_dir, static, self.dest_dir, self.basepath, old_images,
+                                self.image_cache_dir, self.jobs, self.link_static)
+        self.image_attributes = images["attributes"]
+        return images
+
+    def _write_feeds(self, pages, old_generated):
+        generated = write_feeds(pages, self.content_dir, self.template_path, self.dest_dir, self.basepath, self.site_url,
+                                self.minifier)
+        current = set(generated)
+        current.update(entry["output"] for entry in pages.values())
+        for path in old_generated:
+            if path not in current:
+                remove_output(path, self.dest_dir)
+        return generated
+
+    def _is_draft(self, path, entry, previous, old_drafts, drafts):
+        # Unchanged pages keep what their last build recorded; anything else
+        # gets a metadata-only load, which reads the header and not the body
+        if previous is not None and previous["hash"] == entry["hash"] and "meta" in previous:
+            meta = previous["meta"]
+        elif path in old_drafts and old_drafts[path]["hash"] == entry["hash"]:
+            meta = old_drafts[path]["meta"]
+        else:
+            meta = _header_metadata(path)
+        if meta.get("draft") is not True:
+            return False
+        drafts[path] = {"hash": entry["hash"], "meta": meta}
+        return True
+
+    def _write_taxonomies(self, pages, old_state):
+        return write_taxonomies(pages, self.content_dir, self.template_path, self.dest_dir, self.basepath, old_state,
+                                self.minifier)
+
+    def _stale_reason(self, previous, entry, changed):
+        if previous is None or previous["output"] != entry["output"]:
+            return "new page"
+        if previous["hash"] is None:
+            return "previous build failed"
+        if previous["hash"] != entry["hash"]:
+            return "source changed"
+        if not os.path.exists(entry["output"]):
+            return "output missing"
+        return self.graph.stale_reason(entry["output"], changed)
+
+    def rebuild_paths(self, paths, save=True):
+        # Targeted re-render for changed source paths; returns the failures.
+        # With save=False the manifest and graph are left for a later save().
+        if self.manifest is None:
+            self.build()
+        manifest = self.manifest
+        known = set(manifest["pages"])
+        stale = {}
+        content_changed = False
+        static_changed = False
+        for path in sorted(set(self._normalize(p) for p in paths)):
+            if _is_within(path, self.content_dir):
+                self._update_pages(path, stale)
+                content_changed = True
+            elif _is_within(path, self.static_dir):
+                self._update_static(path)
+                static_changed = True
+            else:
+                self._update_dependents(path, stale)
+        if static_changed:
+            old_images = manifest["images"]
+            manifest["images"] = self._process_images(manifest["static"], old_images)
+            resized = changed_images(old_images, manifest["images"])
+            if resized:
+                for page, entry in manifest["pages"].items():
+                    reason = _images_reason(entry, resized)
+                    if reason:
+                        stale.setdefault(page, (entry["output"], reason))
+
+        old_meta = {page: manifest["pages"][page].get("meta") for page in stale if page in manifest["pages"]}
+        failures, _ = self.render([(page, output, reason) for page, (output, reason) in sorted(stale.items())],
+                                  manifest["pages"])
+        for page in stale:
+            if page in manifest["pages"]:
+                manifest["pages"][page]["hash"] = None if page in failures else hash_file(page)
+        if set(manifest["pages"]) != known or self._feeds_affected(stale, old_meta):
+            manifest["generated"] = self._write_feeds(manifest["pages"], manifest.get("generated", []))
+            manifest["taxonomy"] = self._write_taxonomies(manifest["pages"], manifest.get("taxonomy"))
+        # Only the re-rendered pages are checked here; a removed page can
+        # still break links elsewhere until the next full build
+        broken = self._check_links(manifest, [page for page in stale if page not in failures])
+        failures = {**broken, **failures}
+        if save:
+            self.save()
+        if self.minifier is not None:
+            self.minifier.report()
+        return failures
+
+    def _check_links(self, manifest, sources=None):
+        # Returns {source: error} for pages with broken links when they
+        # should fail the build
+        if self.links == "off" or (sources is not None and not sources):
+            return {}
+        targets = {output_url(entry["output"], self.dest_dir) for entry in manifest["pages"].values()}
+        targets.update("/" + rel.replace(os.sep, "/") for rel in manifest["static"])
+        targets.update(output_url(path, self.dest_dir) for path in manifest["generated"])
+        targets.update(output_url(path, self.dest_dir) for path in taxonomy_outputs(manifest.get("taxonomy", {}),
+                                                                                    self.dest_dir))
+        targets.update(output_url(path, self.dest_dir) for path in manifest["images"]["outputs"])
+        broken = check_links(manifest["pages"], targets, self.dest_dir, sources)
+        if self.links != "error":
+            return {}
+        errors = {}
+        for source, line, url in broken:
+            errors.setdefault(source, f"broken link to {url} on line {line}")
+        return errors
+
+    def save(self):
+        save_manifest(self.manifest, self.manifest_path)
+        self.graph.prune_hashes()
+        self.graph.save(self.deps_path)
+
+    def _feeds_affected(self, stale, old_meta):
+        # Listings and the feed only show titles and dates, so an edit to a
+        # dated page's body leaves them alone; undated pages use the source
+        # mtime as their date, and a template change can restyle listings
+        for page, (_, reason) in stale.items():
+            meta = self.manifest["pages"].get(page, {}).get("meta")
+            if reason != "source changed" or meta is None or meta != old_meta.get(page) or not meta.get("date"):
+                return True
+        return False
+
+    def _normalize(self, path):
+        # Match the form of the manifest keys, which follow content_dir
+        if os.path.isabs(self.content_dir):
+            return os.path.abspath(path)
+        return os.path.relpath(path)
+
+    def _update_pages(self, path, stale):
+        pages = self.manifest["pages"]
+        # path and the manifest keys are in the same normalized form, so a
+        # prefix check will do; this runs for every request the daemon gets
+        if path in pages:
+            within = [path]
+        else:
+            prefix = os.path.join(path, "")
+            within = [page for page in pages if page.startswith(prefix)]
+        for page in within:
+            if not os.path.exists(page):
+                output = pages.pop(page)["output"]
+                remove_output(output, self.dest_dir)
+                self.graph.forget(output)
+        drafts = self.manifest.setdefault("drafts", {})
+        for page in [page for page in drafts if not os.path.exists(page)]:
+            drafts.pop(page)
+        if not os.path.exists(path):
+            return
+        if os.path.isdir(path):
+            rel = os.path.relpath(path, self.content_dir)
+            found = collect_pages(path, os.path.normpath(os.path.join(self.dest_dir, rel)))
+        elif path.endswith(".md"):
+            rel = os.path.relpath(os.path.dirname(path), self.content_dir)
+            dest = os.path.normpath(os.path.join(self.dest_dir, rel))
+            found = [(path, output_path_for(os.path.basename(path), dest))]
+        else:
+            found = []
+        for page, output_path in found:
+            drafts.pop(page, None)
+            meta = _header_metadata(page) if not self.drafts else {}
+            if meta.get("draft") is True:
+                drafts[page] = {"hash": hash_file(page), "meta": meta}
+                if page in pages:
+                    output = pages.pop(page)["output"]
+                    remove_output(output, self.dest_dir)
+                    self.graph.forget(output)
+                continue
+            reason = "source changed" if page in pages else "new page"
+            entry = {"hash": None, "output": output_path}
+            if page in pages and "meta" in pages[page]:
+                entry["meta"] = pages[page]["meta"]
+            pages[page] = entry
+            stale[page] = (output_path, reason)
+
+    def _update_dependents(self, path, stale):
+        # A template, partial or data file (or a directory of them) changed:
+        # re-render only the pages recorded as using it
+        for dep in [dep for dep in self.graph.hashes if _is_within(dep, path)]:
+            digest = current_hash(dep)
+            if digest == self.graph.hashes[dep]:
+                continue
+            for output in self.graph.dependents(dep):
+                source = self.graph.outputs[output]["source"]
+                if source in self.manifest["pages"] and source not in stale:
+                    stale[source] = (output, f"{dep} changed")
+
+    def _update_static(self, path):
+        static = self.manifest["static"]
+        prefix = os.path.relpath(path, self.static_dir)
+        for rel in [rel for rel in static if _is_within(rel, prefix)]:
+            if not os.path.exists(os.path.join(self.static_dir, rel)):
+                static.pop(rel)
+                remove_output(os.path.join(self.dest_dir, rel), self.dest_dir)
+        if not os.path.exists(path):
+            return
+        rels = [prefix] if os.path.isfile(path) else [os.path.normpath(os.path.join(prefix, rel)) for rel in collect_static(path)]
+        for rel in rels:
+            src = os.path.join(self.static_dir, rel)
+            dest = os.path.join(self.dest_dir, rel)
+            if is_minified(rel, self.minifier):
+                minify_file(src, dest, self.minifier)
+            else:
+                sync_file(src, dest, self.link_static)
+            static[rel] = signature(os.stat(src))
+            print(f"Copied {src} to {dest}")
+
+def _header_metadata(path):
+    # A page whose header does not parse is not a draft; rendering it then
+    # reports the error for that page alone, like any other page failure
+    try:
+        return load_metadata(path)
+    except Exception:
+        return {}
+
+def _is_within(path, directory):
+    path, directory = os.path.abspath(path), os.path.abspath(directory)
+    return path == directory or path.startswith(directory + os.sep)
+
+def build_site(content_dir, template_path, static_dir, basepath, dest_dir, manifest_path=MANIFEST_PATH, clean=False, jobs=1,
+               cache_dir=PARSE_CACHE_DIR, link_static=True, deps_path=None, io_threads=DEFAULT_IO_THREADS, site_url="",
+               images=True, minify=False, links="warn", drafts=False):
+    builder = Builder(content_dir, template_path, static_dir, basepath, dest_dir, manifest_path, jobs, cache_dir, link_static,
+                      deps_path, io_threads, site_url, images, minify, links, drafts)
+    return builder.build(clean)
@@ -0,0 +1,219 @@
+from build import Builder, BuildError
+from parsecache import MemoryCache
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+DEFAULT_PORT = 8765
+# The manifest and dependency graph are written once requests stop arriving
+# for this long, so a burst of publishes pays for one save, not one each
+SAVE_DELAY = 2.0
+
+class RequestError(Exception):
+    # A request the daemon cannot act on; answered with 400, while anything
+    # else raised while handling a request is a daemon error (500)
+    pass
+
+class BuildDaemon:
+    # Owns one Builder for the life of the process: the manifest (the output
+    # index), the dependency graph, the loaded templates and the most recently
+    # rendered markdown all stay in memory between requests. Requests are
+    # handled one at a time.
+    def __init__(self, builder, save_delay=SAVE_DELAY):
+        self.builder = builder
+        self.builder.cache = MemoryCache(builder.cache) if builder.cache is not None else None
+        self.save_delay = save_delay
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_request = 0.0
+        self.requests = 0
+        self.stopped = threading.Event()
+
+    def handle(self, request):
+        # request is {"command": "rebuild", "paths": [...]}, {"command": "build"}
+        # or {"command": "status"}; returns a JSON-serializable response
+        command = request.get("command")
+        start = time.perf_counter()
+        with self.lock:
+            self.requests += 1
+            if command == "rebuild":
+                paths = request.get("paths")
+                if not isinstance(paths, list) or not paths or not all(isinstance(path, str) for path in paths):
+                    raise RequestError("rebuild needs a non-empty list of paths")
+                failures = self.builder.rebuild_paths(paths, save=False)
+                self.dirty = True
+            elif command == "build":
+                try:
+                    self.builder.build(clean=bool(request.get("clean")))
+                    failures = {}
+                except BuildError as e:
+                    failures = e.failures
+                self.dirty = False
+            elif command == "status":
+                failures = {}
+            else:
+                raise RequestError(f"unknown command {command!r}")
+            self.last_request = time.monotonic()
+            pages = len(self.builder.manifest["pages"]) if self.builder.manifest else 0
+        elapsed = (time.perf_counter() - start) * 1000
+        return {"ok": not failures, "failures": failures, "pages": pages, "requests": self.requests,
+                "ms": round(elapsed, 2)}
+
+    def save_when_idle(self):
+        while not self.stopped.wait(self.save_delay / 4):
+            with self.lock:
+                if self.dirty and time.monotonic() - self.last_request >= self.save_delay:
+                    self.save()
+
+    def save(self):
+        # Callers hold the lock, except at shutdown
+        if self.dirty:
+            self.builder.save()
+            self.dirty = False
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            self.save()
+
+def _respond(daemon, request):
+    try:
+        return 200, daemon.handle(request)
+    except RequestError as e:
+        return 400, {"ok": False, "error": str(e)}
+    except Exception as e:
+        return 500, {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+class DaemonHTTPHandler(BaseHTTPRequestHandler):
+    # POST /rebuild {"paths": [...]}, POST /build {"clean": false}, GET /status
+    daemon = None
+
+    def do_GET(self):
+        if self.path != "/status":
+            return self.send_json(404, {"ok": False, "error": f"no such endpoint {self.path}"})
+        self.send_json(*_respond(self.daemon, {"command": "status"}))
+
+    def do_POST(self):
+        command = self.path.strip("/")
+        if command not in ("rebuild", "build"):
+            return self.send_json(404, {"ok": False, "error": f"no such endpoint {self.path}"})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return self.send_json(400, {"ok": False, "error": f"invalid JSON: {e}"})
+        if not isinstance(request, dict):
+            return self.send_json(400, {"ok": False, "error": "request body must be a JSON object"})
+        request["command"] = command
+        self.send_json(*_respond(self.daemon, request))
+
+    def send_json(self, status, response):
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class DaemonSocketHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line, answered by one JSON line
+    daemon = None
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"ok": False, "error": f"invalid JSON: {e}"}
+            else:
+                _, response = _respond(self.daemon, request if isinstance(request, dict) else {})
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def create_server(daemon, socket_path=None, bind="127.0.0.1", port=DEFAULT_PORT):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        handler = type("Handler", (DaemonSocketHandler,), {"daemon": daemon})
+        return UnixServer(socket_path, handler)
+    handler = type("Handler", (DaemonHTTPHandler,), {"daemon": daemon})
+    server = ThreadingHTTPServer((bind, port), handler)
+    server.daemon_threads = True
+    return server
+
+def send(request, socket_path=None, bind="127.0.0.1", port=DEFAULT_PORT, timeout=60):
+    # Client side: sends one request to a running daemon and returns its response
+    if socket_path:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                return json.loads(f.readline())
+    connection = HTTPConnection(bind, port, timeout=timeout)
+    try:
+        command = request.get("command", "status")
+        if command == "status":
+            connection.request("GET", "/status")
+        else:
+            body = {key: value for key, value in request.items() if key != "command"}
+            connection.request("POST", f"/{command}", json.dumps(body), {"Content-Type": "application/json"})
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep the site loaded in memory and rebuild paths on request")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--socket", metavar="PATH", help="listen on a Unix socket instead of HTTP")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bind", default="127.0.0.1")
+    parser.add_argument("--rebuild", nargs="+", metavar="PATH",
+                        help="do not start a daemon: ask the running one to rebuild PATH and print its response")
+    parser.add_argument("--status", action="store_true", help="print the running daemon's status and exit")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    if args.rebuild or args.status:
+        request = {"command": "rebuild", "paths": args.rebuild} if args.rebuild else {"command": "status"}
+        response = send(request, args.socket, args.bind, args.port)
+        print(json.dumps(response, indent=1))
+        raise SystemExit(0 if response.get("ok") else 1)
+
+    builder = Builder("content", "template.html", "static", args.basepath, "docs")
+    try:
+        builder.build()
+    except BuildError as e:
+        print(f"Build failed: {e}")
+    daemon = BuildDaemon(builder)
+    threading.Thread(target=daemon.save_when_idle, daemon=True).start()
+    server = create_server(daemon, args.socket, args.bind, args.port)
+    where = args.socket or f"http://{args.bind}:{args.port}"
+    print(f"Build daemon listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
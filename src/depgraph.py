@@ -0,0 +1,86 @@
+import json
+import os
+
+from manifest import CACHE_DIR, hash_file, save_json
+
+DEPS_PATH = os.path.join(CACHE_DIR, "deps.json")
+
+def current_hash(path):
+    # A dependency that does not exist (yet) hashes to None, so creating it
+    # later counts as a change
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+class DepGraph:
+    # For every output: the source page, the files it was rendered from
+    # (template, partials, data files, probed section templates) and why it
+    # was last rebuilt. hashes holds the state of every dependency as of the
+    # build that last rendered its dependents.
+    def __init__(self):
+        self.outputs = {}
+        self.hashes = {}
+
+    @classmethod
+    def load(cls, path=DEPS_PATH):
+        graph = cls()
+        if not os.path.exists(path):
+            return graph
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            graph.outputs = data["outputs"]
+            graph.hashes = data["hashes"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls()
+        return graph
+
+    def save(self, path=DEPS_PATH):
+        save_json({"outputs": self.outputs, "hashes": self.hashes}, path)
+
+    def record(self, output, source, deps, reason):
+        self.outputs[output] = {"source": source, "deps": list(deps), "reason": reason}
+
+    def forget(self, output):
+        self.outputs.pop(output, None)
+
+    def prune_hashes(self):
+        used = set()
+        for entry in self.outputs.values():
+            used.update(entry["deps"])
+        for dep in [dep for dep in self.hashes if dep not in used]:
+            del self.hashes[dep]
+
+    def changed(self, hashes=None):
+        # Dependencies whose content differs from what was last built;
+        # hashes memoizes current_hash across calls within one build
+        hashes = {} if hashes is None else hashes
+        changed = set()
+        for dep, recorded in self.hashes.items():
+            if dep not in hashes:
+                hashes[dep] = current_hash(dep)
+            if hashes[dep] != recorded:
+                changed.add(dep)
+        return changed
+
+    def stale_reason(self, output, changed):
+        entry = self.outputs.get(output)
+        if entry is None:
+            return "no dependency record"
+        for dep in entry["deps"]:
+            if dep in changed:
+                return f"{dep} changed"
+        return None
+
+    def dependents(self, path):
+        target = os.path.abspath(path)
+        return sorted(output for output, entry in self.outputs.items()
+                      if any(os.path.abspath(dep) == target for dep in entry["deps"]))
+
+    def why(self, output):
+        target = os.path.abspath(output)
+        for key, entry in self.outputs.items():
+            if os.path.abspath(key) == target:
+                return entry
+        return None
@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+from htmlnode import LeafNode, ParentNode, rewrite_url
+from iopipeline import TMP_SUFFIX, replace_output, write_output
+from profiler import profiled
+from template import load_template, template_for
+
+LISTING_PAGE_SIZE = 20
+FEED_ITEMS = 20
+# The sitemap protocol caps a single file at 50,000 URLs
+SITEMAP_MAX_URLS = 50000
+
+class PageInfo:
+    __slots__ = ("source", "section", "path", "title", "date")
+
+    def __init__(self, source, section, path, title, date):
+        self.source = source
+        self.section = section
+        self.path = path
+        self.title = title
+        self.date = date
+
+def _relative(path, root):
+    # os.path.relpath is the hot spot at 100k pages; manifest paths are
+    # already joined onto root, so a prefix check almost always suffices
+    prefix = os.path.join(root, "")
+    if path.startswith(prefix):
+        return path[len(prefix):]
+    return os.path.relpath(path, root)
+
+def page_path(output, dest_dir):
+    # Root-relative URL of an output: docs/blog/tom/index.html -> /blog/tom/
+    rel = _relative(output, dest_dir).replace(os.sep, "/")
+    if rel == "index.html" or rel.endswith("/index.html"):
+        rel = rel[:-len("index.html")]
+    return "/" + rel
+
+def page_date(meta, source):
+    # The front matter date when it parses, else the source's mtime
+    value = meta.get("date")
+    if value:
+        try:
+            date = datetime.fromisoformat(str(value))
+        except ValueError:
+            date = None
+        if date is not None:
+            return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(os.path.getmtime(source), timezone.utc)
+
+def collect_page_info(pages, content_dir, dest_dir):
+    # pages is the manifest's page table; the metadata was stored when each
+    # page was rendered, so nothing is re-read or re-parsed here
+    infos = []
+    for source, entry in sorted(pages.items()):
+        meta = entry.get("meta")
+        if meta is None:
+            continue
+        parts = _relative(source, content_dir).split(os.sep)
+        section = parts[0] if len(parts) > 1 else None
+        infos.append(PageInfo(source, section, page_path(entry["output"], dest_dir),
+                              meta.get("Title", ""), page_date(meta, source)))
+    return infos
+
+def newest_first(info):
+    return (-info.date.timestamp(), info.path)
+
+def write_sitemap(dest_dir, infos, site_url, basepath):
+    # Streams one <url> element per page; more pages than a sitemap may hold
+    # are split into numbered files listed by a sitemap index
+    written = []
+    def write_urlset(path, chunk):
+        tmp_path = path + TMP_SUFFIX
+        with open(tmp_path, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for info in chunk:
+                loc = escape(site_url + rewrite_url(info.path, basepath))
+                f.write(f"  <url><loc>{loc}</loc><lastmod>{info.date.date().isoformat()}</lastmod></url>\n")
+            f.write("</urlset>\n")
+        replace_output(tmp_path, path)
+        written.append(path)
+
+    sitemap = os.path.join(dest_dir, "sitemap.xml")
+    if len(infos) <= SITEMAP_MAX_URLS:
+        write_urlset(sitemap, infos)
+        return written
+    index = []
+    for number, start in enumerate(range(0, len(infos), SITEMAP_MAX_URLS), start=1):
+        name = f"sitemap-{number}.xml"
+        write_urlset(os.path.join(dest_dir, name), itertools.islice(infos, start, start + SITEMAP_MAX_URLS))
+        index.append(escape(site_url + rewrite_url("/" + name, basepath)))
+    tmp_path = sitemap + TMP_SUFFIX
+    with open(tmp_path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for loc in index:
+            f.write(f"  <sitemap><loc>{loc}</loc></sitemap>\n")
+        f.write("</sitemapindex>\n")
+    replace_output(tmp_path, sitemap)
+    written.append(sitemap)
+    return written
+
+def write_feed(path, posts, title, site_url, basepath):
+    # RSS 2.0 with the newest FEED_ITEMS posts, picked without sorting them all
+    link = escape(site_url + rewrite_url("/", basepath))
+    tmp_path = path + TMP_SUFFIX
+    with open(tmp_path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0">\n<channel>\n')
+        f.write(f"  <title>{escape(title)}</title>\n  <link>{link}</link>\n  <description>{escape(title)}</description>\n")
+        for info in heapq.nsmallest(FEED_ITEMS, posts, key=newest_first):
+            url = escape(site_url + rewrite_url(info.path, basepath))
+            f.write(f"  <item><title>{escape(info.title)}</title><link>{url}</link><guid>{url}</guid>"
+                    f"<pubDate>{format_datetime(info.date)}</pubDate></item>\n")
+        f.write("</channel>\n</rss>\n")
+    replace_output(tmp_path, path)
+    return [path]
+
+def listing_output(dest_dir, section, number):
+    if number == 1:
+        return os.path.join(dest_dir, section, "index.html")
+    return os.path.join(dest_dir, section, "page", str(number), "index.html")
+
+def listing_node(items, newer, older):
+    links = [ParentNode("li", [LeafNode("a", info.title, {"href": info.path})]) for info in items]
+    children = [ParentNode("ul", links)]
+    nav = []
+    if newer:
+        nav.append(LeafNode("a", "Newer", {"href": newer}))
+    if older:
+        nav.append(LeafNode("a", "Older", {"href": older}))
+    if nav:
+        children.append(ParentNode("nav", nav))
+    return ParentNode("div", children)
+
+def write_listing(dest_dir, section, posts, template, reserved, minifier=None, title=None):
+    # One page per LISTING_PAGE_SIZE posts, newest first; reserved holds the
+    # absolute output paths of content pages, which a listing leaves alone.
+    # section is the listing's directory below dest_dir, e.g. blog or tags/elves
+    posts = sorted(posts, key=newest_first)
+    pages = (len(posts) + LISTING_PAGE_SIZE - 1) // LISTING_PAGE_SIZE
+    outputs = []
+    written = []
+    for number in range(1, pages + 1):
+        output = listing_output(dest_dir, section, number)
+        if os.path.abspath(output) in reserved:
+            print(f"Warning: listing page {output} is a content page, not generated")
+            continue
+        outputs.append(output)
+        items = posts[(number - 1) * LISTING_PAGE_SIZE:number * LISTING_PAGE_SIZE]
+        newer = page_path(listing_output(dest_dir, section, number - 1), dest_dir) if number > 1 else None
+        older = page_path(listing_output(dest_dir, section, number + 1), dest_dir) if number < pages else None
+        context = {"Title": title or section.capitalize(), "Content": listing_node(items, newer, older)}
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        html = template.render(context)
+        if minifier is not None:
+            html = minifier.minify_counted(html, "html")
+        if write_output(output, html):
+            written.append(output)
+    return outputs, written
+
+@profiled("feeds")
+def write_feeds(pages, content_dir, template_path, dest_dir, basepath, site_url="", minifier=None):
+    # Sitemap of every page, plus a listing and a feed of the posts in the
+    # sections that have no index.md of their own (content/blog/*). Returns
+    # every file written so the build can own and later remove them.
+    # Sitemaps and feeds need absolute URLs, so without a site_url only the
+    # listings are written.
+    site_url = site_url.rstrip("/")
+    os.makedirs(dest_dir, exist_ok=True)
+    infos = collect_page_info(pages, content_dir, dest_dir)
+    if site_url:
+        outputs = write_sitemap(dest_dir, infos, site_url, basepath)
+    else:
+        print("Warning: no --site-url given, sitemap.xml and feed.xml are not written")
+        outputs = []
+
+    sections = {}
+    for info in infos:
+        if info.section is not None:
+            sections.setdefault(info.section, []).append(info)
+    listed = sorted(section for section in sections
+                    if os.path.join(content_dir, section, "index.md") not in pages)
+    page_outputs = {os.path.abspath(entry["output"]) for entry in pages.values()} if listed else set()
+    listing_pages = 0
+    written = 0
+    for section in listed:
+        path, _ = template_for(os.path.join(content_dir, section, "index.md"), content_dir, template_path, {})
+        template = load_template(path, basepath, os.path.dirname(template_path))
+        section_outputs, section_written = write_listing(dest_dir, section, sections[section], template, page_outputs,
+                                                        minifier)
+        outputs.extend(section_outputs)
+        listing_pages += len(section_outputs)
+        written += len(section_written)
+
+    posts = [info for section in listed for info in sections[section]]
+    if posts and site_url:
+        home = next((info for info in infos if info.path == "/"), None)
+        title = home.title if home is not None else "Feed"
+        outputs.extend(write_feed(os.path.join(dest_dir, "feed.xml"), posts, title, site_url, basepath))
+    if site_url:
+        print(f"Feeds: sitemap with {len(infos)} URLs, feed with {min(len(posts), FEED_ITEMS)} items, "
+              f"{listing_pages} listing pages ({written} written)")
+    else:
+        print(f"Feeds: {listing_pages} listing pages ({written} written)")
+    return outputs
@@ -0,0 +1,66 @@
+import json
+import os
+
+from manifest import CACHE_DIR, hash_file, save_json
+
+FILE_INDEX_PATH = os.path.join(CACHE_DIR, "files.json")
+FILE_INDEX_VERSION = "1"
+
+def walk_files(root):
+    # Every file under root as {rel: [size, mtime_ns]}, sorted by path. One
+    # scandir per directory; the entries already know whether they are
+    # directories, so the only other call per file is its stat.
+    if not os.path.exists(root):
+        raise Exception("Error: Path is not existing")
+    files = {}
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        with os.scandir(os.path.join(root, rel_dir) if rel_dir else root) as entries:
+            for entry in entries:
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir():
+                    pending.append(rel)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[rel] = [stat.st_size, stat.st_mtime_ns]
+    return dict(sorted(files.items()))
+
+class FileIndex:
+    # The files under each scanned root with their size, mtime and, once
+    # asked for, content hash. Persisted between builds so that a file whose
+    # size and mtime did not change is not read again just to hash it.
+    def __init__(self, roots=None):
+        self.roots = roots or {}
+
+    @classmethod
+    def load(cls, path=FILE_INDEX_PATH):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != FILE_INDEX_VERSION:
+            return cls()
+        return cls(data.get("roots", {}))
+
+    def save(self, path=FILE_INDEX_PATH):
+        save_json({"version": FILE_INDEX_VERSION, "roots": self.roots}, path, compact=True)
+
+    def scan(self, root):
+        # Returns {rel: [size, mtime_ns]} for root; hashes of unchanged files
+        # carry over from the previous scan
+        previous = self.roots.get(root, {})
+        files = walk_files(root)
+        entries = {}
+        for rel, signature in files.items():
+            old = previous.get(rel)
+            entries[rel] = signature + [old[2] if old is not None and old[:2] == signature else None]
+        self.roots[root] = entries
+        return files
+
+    def hash(self, root, rel):
+        entry = self.roots[root][rel]
+        if entry[2] is None:
+            entry[2] = hash_file(os.path.join(root, rel))
+        return entry[2]
@@ -0,0 +1,176 @@
+import itertools
+import json
+import re
+
+FRONT_MATTER_DELIMITER = "---"
+
+# A small YAML subset: "key: value" pairs whose values are scalars
+# (strings, numbers, true/false, null), [inline, lists], block lists of
+# "- item" lines, one level of nested "key: value" lines, and | or > block
+# text. Anything deeper is rejected rather than guessed at.
+_INT = re.compile(r"[-+]?\d+")
+_FLOAT = re.compile(r"[-+]?(\d+\.\d*|\.\d+)([eE][-+]?\d+)?")
+_SCALARS = {"true": True, "false": False, "null": None, "~": None}
+
+def read_front_matter(lines):
+    # Optional YAML-style header fenced by --- lines at the very top.
+    # Consumes only the header and returns the iterator over the body lines.
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return {}, lines
+    if first.strip() != FRONT_MATTER_DELIMITER:
+        return {}, itertools.chain([first], lines)
+    header = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.strip() == FRONT_MATTER_DELIMITER:
+            return _parse_header(header), lines
+        header.append(line)
+    raise Exception("Front matter is not closed")
+
+def _parse_header(header):
+    metadata = {}
+    key = None
+    block = None
+    for line in header:
+        stripped = line.strip()
+        indented = line[:1].isspace()
+        if block is not None:
+            # | keeps the newlines of a block, > folds them into spaces
+            if indented or not stripped:
+                block[1].append(stripped)
+                continue
+            metadata[key] = _join_block(*block)
+            block = None
+        if not stripped or stripped.startswith("#"):
+            continue
+        if indented or stripped.startswith("- "):
+            if key is None:
+                raise Exception(f"Invalid front matter line: {line}")
+            metadata[key] = _nested_value(metadata[key], stripped, line)
+            continue
+        name, sep, value = line.partition(":")
+        if not sep or not name.strip():
+            raise Exception(f"Invalid front matter line: {line}")
+        key = name.strip()
+        value = value.strip()
+        if value in ("|", ">"):
+            block = (value, [])
+            metadata[key] = ""
+        else:
+            metadata[key] = _parse_value(value)
+    if block is not None:
+        metadata[key] = _join_block(*block)
+    return metadata
+
+def _nested_value(current, stripped, line):
+    # Continues the value of the last key: "- item" lines make a list,
+    # indented "name: value" lines a mapping
+    if stripped.startswith("- ") or stripped == "-":
+        if current == "":
+            current = []
+        if not isinstance(current, list):
+            raise Exception(f"Invalid front matter line: {line}")
+        current.append(_parse_value(stripped[1:].strip()))
+        return current
+    name, sep, value = stripped.partition(":")
+    if current == "":
+        current = {}
+    if not sep or not isinstance(current, dict):
+        raise Exception(f"Invalid front matter line: {line}")
+    current[name.strip()] = _parse_value(value.strip())
+    return current
+
+def _join_block(style, lines):
+    while lines and not lines[-1]:
+        lines.pop()
+    return ("\n" if style == "|" else " ").join(lines)
+
+def parse_front_matter(markdown):
+    if markdown.split("\n", 1)[0].strip() != FRONT_MATTER_DELIMITER:
+        return {}, markdown
+    metadata, body = read_front_matter(markdown.split("\n"))
+    return metadata, "\n".join(body)
+
+def count_front_matter_lines(lines):
+    # Lines the header takes, delimiters included; 0 when there is none
+    lines = iter(lines)
+    if next(lines, "").strip() != FRONT_MATTER_DELIMITER:
+        return 0
+    for count, line in enumerate(lines, start=2):
+        if line.strip() == FRONT_MATTER_DELIMITER:
+            return count
+    return 0
+
+def load_metadata(path):
+    # Metadata-only load of a page: reads the front matter and then only as
+    # far as the first h1, which becomes "Title" exactly as when the page is
+    # rendered. The rest of the body is never read or parsed.
+    with open(path) as f:
+        metadata, lines = read_front_matter(f)
+        for line in lines:
+            if line.startswith("# "):
+                metadata["Title"] = line.lstrip("#").strip()
+                break
+    return metadata
+
+def _parse_value(value):
+    value = _strip_comment(value)
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return _unquote(value)
+    if value.startswith("[") and value.endswith("]"):
+        return [_parse_value(item) for item in _split_items(value[1:-1])]
+    lowered = value.lower()
+    if lowered in _SCALARS:
+        return _SCALARS[lowered]
+    if _INT.fullmatch(value):
+        return int(value)
+    if _FLOAT.fullmatch(value):
+        return float(value)
+    return value
+
+def _strip_comment(value):
+    # A " #" outside quotes starts a comment running to the end of the line
+    if " #" not in value:
+        return value
+    quote = None
+    for idx, char in enumerate(value):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'" and value[:idx].rstrip()[-1:] in ("", "[", ","):
+            # Only a quote opening a value or list item quotes: don't # x
+            quote = char
+        elif char == "#" and idx and value[idx - 1].isspace():
+            return value[:idx].rstrip()
+    return value
+
+def _unquote(value):
+    if value[0] == "'":
+        return value[1:-1].replace("''", "'")
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value[1:-1]
+
+def _split_items(text):
+    # Commas inside quotes do not separate items
+    items = []
+    current = []
+    quote = None
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == ",":
+            items.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    last = "".join(current).strip()
+    if last or items:
+        items.append(last)
+    return items
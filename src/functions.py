@@ -1,30 +1,117 @@
 from textnode import TextType, TextNode, BlockType
-from htmlnode import LeafNode, HTMLNode, ParentNode
+from htmlnode import LeafNode, HTMLNode, ParentNode, URL_ATTRIBUTES, rewrite_url
+from template import load_template, template_for
+from frontmatter import parse_front_matter, read_front_matter, count_front_matter_lines
+from staticsync import sync_static, remove_output
+from fileindex import walk_files
+from profiler import PROFILER, profiled
+from iopipeline import TMP_SUFFIX, write_output, replace_output
+import itertools
+import json
 import re
 import os
 import shutil
 
+# Part of every parse cache key; bump whenever markdown_to_html_node output changes
+PARSER_VERSION = "2"
+
+# Extra <img> attributes (width, height, srcset, ...) by src, filled in by
+# the image stage before pages render. Like the basepath they are applied to
+# the HTML as it is written, so parsed and cached HTML never depends on them.
+IMAGE_ATTRIBUTES = {}
+# The attributes as HTML per basepath, by the src the page will carry
+_IMAGE_PROPS = {}
+# <img> exactly as HTMLNode writes it; the extra attributes go before the >
+_IMG_TAG = re.compile(r'<img src="([^"]*)" alt="[^"]*"(?=></img>)')
+
+def set_image_attributes(attributes):
+    IMAGE_ATTRIBUTES.clear()
+    IMAGE_ATTRIBUTES.update(attributes)
+    _IMAGE_PROPS.clear()
+
+def add_image_attributes(html, basepath):
+    if not IMAGE_ATTRIBUTES or "<img " not in html:
+        return html
+    props = _IMAGE_PROPS.get(basepath)
+    if props is None:
+        props = _IMAGE_PROPS[basepath] = {
+            rewrite_url(url, basepath): "".join(f' {key}="{value}"' for key, value in attributes.items())
+            for url, attributes in IMAGE_ATTRIBUTES.items()}
+    return _IMG_TAG.sub(lambda match: match.group(0) + props.get(match.group(1), ""), html)
+
 def text_node_to_html_node(text_node):
     match text_node.text_type:
         case TextType.TEXT:
             return LeafNode(None, text_node.text)
         case TextType.BOLD:
-            return LeafNode("b", text_node.text)
+            return inline_html_node("b", text_node.text)
         case TextType.ITALIC:
-            return LeafNode("i", text_node.text)
+            return inline_html_node("i", text_node.text)
         case TextType.CODE:
             return LeafNode("code", text_node.text)
         case TextType.LINK:
             if not text_node.url:
                 raise ValueError("LINK requires url")
-            return LeafNode("a", text_node.text, {"href": text_node.url})
+            return inline_html_node("a", text_node.text, {"href": text_node.url})
         case TextType.IMAGE:
             if not text_node.url:
                 raise ValueError("IMAGE requires url")
             return LeafNode("img","",{"src": text_node.url, "alt": text_node.text})
         case _:
             raise ValueError(f"Unknown TextType: {text_node.text_type}")
-        
+
+def inline_html_node(tag, text, props=None):
+    # Bold, italic and link text may itself contain inline markup
+    if _INLINE_SPECIAL.search(text) is None:
+        return LeafNode(tag, text, props)
+    children = [text_node_to_html_node(node) for node in tokenize_inline(text, strict=False)]
+    return ParentNode(tag, children, props)
+
+_INLINE_SPECIAL = re.compile(r"\*\*|[_`\[]|!\[")
+_IMAGE_MARKDOWN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_MARKDOWN = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_NOT_IMAGE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_INLINE_DELIMITERS = {"**": TextType.BOLD, "_": TextType.ITALIC, "`": TextType.CODE}
+
+def tokenize_inline(text, strict=True):
+    # Single left-to-right scan producing the same nodes as the split_nodes_*
+    # chain. Each special character is looked at once and every delimiter,
+    # image or link is consumed whole, so the scan is linear in len(text).
+    nodes = []
+    pending = 0
+    pos = 0
+    while True:
+        match = _INLINE_SPECIAL.search(text, pos)
+        if match is None:
+            break
+        start, token = match.start(), match.group()
+        text_type = _INLINE_DELIMITERS.get(token)
+        if text_type is not None:
+            end = text.find(token, match.end())
+            if end == -1:
+                if strict:
+                    raise Exception("Invalid markdown syntax")
+                pos = match.end()
+                continue
+            node = TextNode(text[match.end():end], text_type)
+            pos = end + len(token)
+        else:
+            pattern = _IMAGE_MARKDOWN if token == "![" else _LINK_MARKDOWN
+            found = pattern.match(text, start)
+            if found is None:
+                pos = match.end()
+                continue
+            link_type = TextType.IMAGE if token == "![" else TextType.LINK
+            node = TextNode(found.group(1), link_type, found.group(2))
+            pos = found.end()
+        if start > pending:
+            nodes.append(TextNode(text[pending:start], TextType.TEXT))
+        nodes.append(node)
+        pending = pos
+    if pending < len(text):
+        nodes.append(TextNode(text[pending:], TextType.TEXT))
+    return nodes
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     #print(old_nodes)
     text_list = []
@@ -44,10 +131,10 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return new_nodes
 
 def extract_markdown_images(text):
-    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)",text)
+    return _IMAGE_MARKDOWN.findall(text)
 
 def extract_markdown_links(text):
-    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)",text)
+    return _LINK_NOT_IMAGE.findall(text)
 
 def split_nodes_image(old_nodes):
     new_nodes = []
@@ -108,216 +195,423 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 def text_to_text_nodes(text):
-    new_nodes = split_nodes_delimiter([text],"**", TextType.BOLD)
-    new_nodes = split_nodes_delimiter(new_nodes, "_", TextType.ITALIC)
-    new_nodes = split_nodes_delimiter(new_nodes, "`", TextType.CODE)
-    new_nodes = split_nodes_image(new_nodes)
-    new_nodes = split_nodes_link(new_nodes)
-
-    return new_nodes
-
+    if text.text_type is not TextType.TEXT:
+        return [text]
+    return tokenize_inline(text.text)
+
+_HEADING_LINE = re.compile(r"^#{1,6} .+\S$")
+_ORDERED_ITEM = re.compile(r"(\d+)\. ")
+_FENCE = "```"
+
+def _is_ordered_item(line, idx):
+    if line.startswith(f"{idx}. "):
+        return True
+    match = _ORDERED_ITEM.match(line)
+    return match is not None and int(match.group(1)) == idx
+
+# Every line of a quote or list block starts with the same marker, so the
+# first character of a block leaves at most one candidate type, and each
+# further line is checked against that candidate only. Ordered lists count
+# from 1 (or 01, 001, ...).
+_LINE_MATCHERS = {
+    BlockType.QUOTE: lambda line, idx: line.startswith(">"),
+    BlockType.UNORDERED_LIST: lambda line, idx: line.startswith("- "),
+    BlockType.ORDERED_LIST: _is_ordered_item,
+}
+_FIRST_CHAR_CANDIDATES = {
+    "#": BlockType.HEADING,
+    ">": BlockType.QUOTE,
+    "-": BlockType.UNORDERED_LIST,
+    "0": BlockType.ORDERED_LIST,
+    "1": BlockType.ORDERED_LIST,
+}
+
+class _BlockState:
+    # Running classification of the block being read, one line at a time
+    __slots__ = ("lines", "start", "candidate", "matcher", "valid", "prev")
+
+    def __init__(self, start):
+        self.lines = []
+        self.start = start
+        self.candidate = None
+        self.matcher = None
+        self.valid = self.prev = False
+
+    def add(self, line):
+        if not self.lines:
+            line = line.lstrip()
+            self.candidate = _FIRST_CHAR_CANDIDATES.get(line[:1])
+            self.matcher = _LINE_MATCHERS.get(self.candidate)
+            self.valid = self.matcher is not None
+        self.prev = self.valid
+        if self.valid:
+            self.valid = self.matcher(line, len(self.lines) + 1)
+        self.lines.append(line)
+
+    def finish(self):
+        # Blocks used to be stripped as a whole, so trailing whitespace only
+        # matters on the last line
+        last = self.lines[-1].rstrip()
+        if last != self.lines[-1]:
+            self.lines[-1] = last
+            if self.matcher is not None:
+                self.valid = self.prev and self.matcher(last, len(self.lines))
+        if self.candidate is BlockType.HEADING:
+            return BlockType.HEADING if _HEADING_LINE.match(self.lines[0]) else BlockType.PARAGRAPH
+        return self.candidate if self.valid else BlockType.PARAGRAPH
+
+def scan_blocks(lines):
+    # Single forward pass over the lines of a document, yielding
+    # (block_type, lines, first_line_number) tuples. Fenced code runs from an
+    # opening ``` line to the closing one and may contain blank lines.
+    block = None
+    fence = None
+    number = 0
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if fence is not None:
+            fence.append(line)
+            if line.rstrip().endswith(_FENCE):
+                yield BlockType.CODE, fence, start
+                fence = None
+            continue
+        stripped = line.strip()
+        if stripped.startswith(_FENCE):
+            if block is not None:
+                yield block.finish(), block.lines, block.start
+                block = None
+            if len(stripped) > 2 * len(_FENCE) - 1 and stripped.endswith(_FENCE):
+                yield BlockType.CODE, [stripped], number
+            else:
+                fence, start = [stripped], number
+            continue
+        if not stripped:
+            if block is not None:
+                yield block.finish(), block.lines, block.start
+                block = None
+            continue
+        if block is None:
+            block = _BlockState(number)
+        block.add(line)
+    if fence is not None:
+        yield BlockType.CODE, fence, start
+    elif block is not None:
+        yield block.finish(), block.lines, block.start
+
+@profiled("blocks")
 def markdown_to_blocks(markdown):
-    parts = markdown.split("\n\n")
-    blocks = []
-    for p in parts:
-        s = p.strip()
-        if s:
-            blocks.append(s)
-    return blocks
+    return ["\n".join(lines) for _, lines, _ in scan_blocks(markdown.split("\n"))]
+
+# Whole-block checks for a block whose first line already starts with the
+# candidate's marker; the quote and list checks count line starts instead of
+# looping over the lines
+_BLOCK_MATCHERS = {
+    BlockType.HEADING: lambda block: _HEADING_LINE.match(block.split("\n", 1)[0]) is not None,
+    BlockType.QUOTE: lambda block: block.count("\n") == block.count("\n>"),
+    BlockType.UNORDERED_LIST: lambda block: block.startswith("- ") and block.count("\n") == block.count("\n- "),
+    BlockType.ORDERED_LIST: lambda block: all(map(_is_ordered_item, block.split("\n"), itertools.count(1))),
+}
 
 def block_to_block_type(blocks):
-    parts = blocks.split("\n")
-    if blocks.startswith("```") and blocks.endswith("```"):
-        #print(BlockType.CODE)
+    if blocks.startswith(_FENCE) and blocks.endswith(_FENCE):
         return BlockType.CODE
-    
-    if re.match(r"^#{1,6} .+\S$", parts[0]):
-        #print(BlockType.HEADING)
-        return BlockType.HEADING
-    all_quote, all_ul, all_ol = True, True, True
-    for idx, line in enumerate(parts, start=1):
-        all_quote &= line.startswith(">")
-        all_ul &= line.startswith("- ")
-
-        j = 0
-        while j <len(line) and line[j].isdigit():
-            j +=1
-        if j == 0:
-            all_ol = False
-        else:
-            all_ol &= j + 1 < len(line) and line[j:j+2] == ". " and int(line[:j]) == idx
-
-
-    if all_quote:
-        #print(BlockType.QUOTE)
-        return BlockType.QUOTE
-    if all_ul:
-        #print(BlockType.UNORDERED_LIST)
-        return BlockType.UNORDERED_LIST
-    if all_ol:
-        #print(BlockType.ORDERED_LIST)
-        return BlockType.ORDERED_LIST
-    return BlockType.PARAGRAPH   
-
+    if blocks[:1].isspace() or blocks[-1:].isspace():
+        # Not a stripped block: classify line by line, as scan_blocks does
+        state = _BlockState(1)
+        for line in blocks.split("\n"):
+            state.add(line)
+        return state.finish()
+    candidate = _FIRST_CHAR_CANDIDATES.get(blocks[:1])
+    if candidate is not None and _BLOCK_MATCHERS[candidate](blocks):
+        return candidate
+    return BlockType.PARAGRAPH
+
+@profiled("inline")
 def text_to_children(text):
     #print(f"[DEBUG INSIDE FUNCTION] Text: {text}")
-    nodes = split_nodes_delimiter([TextNode(text, TextType.TEXT)], "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes =split_nodes_link(nodes)
     leaf_nodes = []
 
-    for node in nodes:
+    for node in tokenize_inline(text):
         leaf_nodes.append(text_node_to_html_node(node))
     
     return leaf_nodes
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
+def code_block_text(lines):
+    if len(lines) == 1:
+        return lines[0][len(_FENCE):-len(_FENCE)]
+    body = lines[1:-1] if lines[-1].rstrip().endswith(_FENCE) else lines[1:]
+    return "".join(line + "\n" for line in body)
+
+def block_to_html_node(block_type, lines):
+    if block_type == BlockType.CODE:
+        text_node = TextNode(code_block_text(lines), TextType.CODE)
+        return ParentNode("pre",[text_node_to_html_node(text_node)])
+    if block_type == BlockType.UNORDERED_LIST:
+        return ParentNode("ul", [ParentNode("li", text_to_children(line[2:])) for line in lines])
+    if block_type == BlockType.ORDERED_LIST:
+        items = [line[_ORDERED_ITEM.match(line).end():] for line in lines]
+        return ParentNode("ol", [ParentNode("li", text_to_children(item)) for item in items])
+    if block_type == BlockType.QUOTE:
+        list_children_list = []
+        for item in lines:
+            line = item.lstrip()
+            if not line.startswith(">"):
+                continue
+            content = line[1:].lstrip()
+            if not content:
+                continue
+            list_children_list.append(text_node_to_html_node(TextNode(content,TextType.TEXT)))
+        return ParentNode(block_type.value, list_children_list)
+    if block_type == BlockType.HEADING:
+        header_type = len(lines[0].split(" ", 1)[0])
+        final = "\n".join(lines)[header_type:].lstrip()
+        html_node = text_node_to_html_node(TextNode(final, TextType.TEXT))
+        return ParentNode(f"h{header_type}", [html_node])
+    return ParentNode(block_type.value, text_to_children(" ".join(lines)))
+
+def node_urls(node):
+    # Every href and src in a node's tree, in document order
+    urls = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if item.props:
+            for key in URL_ATTRIBUTES:
+                url = item.props.get(key)
+                if url:
+                    urls.append(url)
+        if item.children:
+            stack.extend(reversed(item.children))
+    return urls
+
+def collect_links(node, lines, start, links):
+    # Appends [url, line number] for every link of a block whose first line
+    # is line start; links are found in order, so the search moves forward
+    cursor = 0
+    for url in node_urls(node):
+        target = f"]({url})"
+        for idx in range(cursor, len(lines)):
+            if target in lines[idx]:
+                cursor = idx
+                break
+        links.append([url, start + cursor])
+
+@profiled("parse")
+def markdown_to_html_node(markdown, links=None):
+    # With a links list, also collects the links of the document as it goes
     children_list = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.CODE:
-            stripped_text = block.split("```")
-            final_text = stripped_text[1].lstrip()
-            text_node = TextNode(final_text, TextType.CODE)
-            parent_node = ParentNode("pre",[text_node_to_html_node(text_node)])
-            children_list.append(parent_node)
-        elif block_type == BlockType.UNORDERED_LIST:
-            list_items = block.split("\n")
-            list_children_list = []
-            for item in list_items:
-                modified_item=item.split("- ")
-                item_text = modified_item[1]
-                li_node = ParentNode("li", text_to_children(item_text))
-                list_children_list.append(li_node)
-            parent_node = ParentNode("ul",list_children_list)
-            children_list.append(parent_node)
-        elif block_type == BlockType.ORDERED_LIST:
-            list_items = block.split("\n")
-            list_children_list = []
-            for item in list_items:
-                modified_item = item.split(". ")
-                item_text = modified_item[1]
-                li_node = ParentNode("li", text_to_children(item_text))
-                list_children_list.append(li_node)
-            parent_node = ParentNode("ol", list_children_list)
-            children_list.append(parent_node)
-        elif block_type == BlockType.QUOTE:
-            list_items = block.split("\n")
-            list_children_list = []
-            for item in list_items:
-                line = item.lstrip()
-                if not line.startswith(">"):
-                    continue
-                content = line[1:].lstrip()
-                if not content:
-                    continue
-                list_children_list.append(text_node_to_html_node(TextNode(content,TextType.TEXT)))
-            parent_node = ParentNode(block_type.value, list_children_list)
-            children_list.append(parent_node)
-        elif block_type == BlockType.HEADING:
-            splitted_block= block.split(" ")
-            header_type = len(splitted_block[0])
-            splitted_text = block.split(header_type * "#")
-            final = splitted_text[1].lstrip()
-            html_node = text_node_to_html_node(TextNode(final, TextType.TEXT))
-            parent_node = ParentNode(f"h{header_type}", [html_node])
-            children_list.append(parent_node)
-        else:
-            modified_block = block.replace("\n", " ")
-            html_node = ParentNode(block_type.value, text_to_children(modified_block))
-            children_list.append(html_node)
-
-
-    final_parent = ParentNode("div", children_list)
-
-    return final_parent
-
-def initial_setup(dest):
+    for block_type, lines, start in scan_blocks(markdown.split("\n")):
+        node = block_to_html_node(block_type, lines)
+        if links is not None:
+            collect_links(node, lines, start, links)
+        children_list.append(node)
+    return ParentNode("div", children_list)
+
+def reset_output_dir(dest):
     if os.path.exists(dest):
         shutil.rmtree(dest)
     os.mkdir(dest)
+
+def initial_setup(dest):
+    reset_output_dir(dest)
     copy_static_content("static",dest)
 
 def copy_static_content(file_path, dest):
-    if not os.path.exists(file_path):
-        raise Exception("Error: Path is not existing")
-    items_list = os.listdir(file_path)
-    print(items_list)
-    
-    for item in items_list:
-        path = os.path.join(file_path, item)
-        if os.path.isfile(path):
-            shutil.copy(path, dest)
-        else:
-            os.mkdir(os.path.join(dest,item))
-            copy_static_content(path, os.path.join(dest,item))
+    sync_static(file_path, dest, {})
     
 def extract_title(markdown):
-    lines = markdown.split("\n")
+    return extract_title_from_lines(markdown.split("\n"))
+
+def extract_title_from_lines(lines):
     for line in lines:
         if line.startswith("# "):
             title = line.lstrip("#").strip()
             return title
     raise Exception("There is no h1 header")
 
-def generate_page(from_path, template_path,basepath, output_path):
-    #print(basepath)
-    print(f"Generating page from {from_path} to {basepath} using {template_path}")
-
-    with open(from_path) as f:
-        markdown_content = f.read()
-    with open(template_path) as f:
-        template = f.read()
-
-    html = template.replace("{{ Title }}", extract_title(markdown_content))
-    html = html.replace("{{ Content }}", markdown_to_html_node(markdown_content).to_html())
-    html = html.replace('href="/',f'href="{basepath}')
-    html = html.replace('src="/',f'src="{basepath}')
-
-    dirpath = os.path.dirname(output_path)
-    if dirpath:
-        os.makedirs(dirpath, exist_ok=True)
-
-    with open(output_path, "w") as f:
-        f.write(html)  
+# Sources at least this large are converted block by block while the output
+# is written, instead of being read and parsed whole
+STREAMING_THRESHOLD = 8 * 1024 * 1024
+
+class MarkdownStream:
+    # Page content that is read, parsed and serialized lazily, one block at a
+    # time, so peak memory is bounded by the largest block
+    def __init__(self, path, links=None):
+        self.path = path
+        # Filled with [url, line] pairs while the page is written; each url
+        # is kept once, at its first line, so a page repeating the same few
+        # links does not grow the list with its length
+        self.links = links
+
+    def title(self):
+        with open(self.path) as f:
+            _, lines = read_front_matter(f)
+            return extract_title_from_lines(lines)
+
+    def iter_html(self, basepath=None):
+        with open(self.path) as f:
+            offset = count_front_matter_lines(f) if self.links is not None else 0
+            f.seek(0)
+            _, lines = read_front_matter(f)
+            seen = set()
+            found = []
+            yield "<div>"
+            for block_type, block_lines, start in scan_blocks(lines):
+                node = block_to_html_node(block_type, block_lines)
+                if self.links is not None:
+                    collect_links(node, block_lines, start + offset, found)
+                    for link in found:
+                        if link[0] not in seen:
+                            seen.add(link[0])
+                            self.links.append(link)
+                    found.clear()
+                if IMAGE_ATTRIBUTES:
+                    yield add_image_attributes(node.to_html(basepath), basepath)
+                else:
+                    yield from node.iter_html(basepath)
+            yield "</div>"
+
+    def write_html(self, sink, basepath=None):
+        write = sink.write
+        for fragment in self.iter_html(basepath):
+            write(fragment)
+
+def render_content(markdown, basepath, cache=None, links=None):
+    # links, when given, receives the document's [url, line] pairs; cache
+    # entries then hold them as a JSON line ahead of the HTML, so a hit
+    # needs no parse for them either
+    if cache is None:
+        node = markdown_to_html_node(markdown, links)
+        if not IMAGE_ATTRIBUTES:
+            return node
+        with PROFILER.span("serialize"):
+            html = node.to_html(basepath)
+        return add_image_attributes(html, basepath)
+    if links is None:
+        key = cache.key(markdown, PARSER_VERSION, basepath)
+    else:
+        key = cache.key(markdown, PARSER_VERSION, basepath, "links")
+    with PROFILER.span("cache"):
+        html = cache.get(key)
+    if html is None:
+        found = [] if links is not None else None
+        node = markdown_to_html_node(markdown, found)
+        with PROFILER.span("serialize"):
+            html = node.to_html(basepath)
+        with PROFILER.span("cache"):
+            cache.put(key, html if links is None else json.dumps(found) + "\n" + html)
+        if links is not None:
+            links.extend(found)
+    elif links is not None:
+        cached_links, html = html.split("\n", 1)
+        links.extend(json.loads(cached_links))
+    return add_image_attributes(html, basepath)
+
+def page_context(from_path, basepath, cache=None, streaming_threshold=STREAMING_THRESHOLD, source=None, links=None):
+    # source is the already read markdown, if the caller prefetched it;
+    # links, when given, receives [url, line] for every link on the page
+    if source is None and os.path.getsize(from_path) >= streaming_threshold:
+        stream = MarkdownStream(from_path, links)
+        with PROFILER.span("read"):
+            with open(from_path) as f:
+                metadata, _ = read_front_matter(f)
+        context = dict(metadata)
+        context["Title"] = stream.title()
+        context["Content"] = stream
+        return context
+
+    if source is None:
+        with PROFILER.span("read"):
+            with open(from_path) as f:
+                source = f.read()
+    metadata, markdown_content = parse_front_matter(source)
+    context = dict(metadata)
+    context["Title"] = extract_title(markdown_content)
+    if links is None:
+        context["Content"] = render_content(markdown_content, basepath, cache)
+        return context
+    body_links = []
+    context["Content"] = render_content(markdown_content, basepath, cache, body_links)
+    # Line numbers count from the top of the file, front matter included
+    offset = source.count("\n", 0, len(source) - len(markdown_content))
+    links.extend([url, line + offset] for url, line in body_links)
+    return context
+
+def generate_page(from_path, template_path,basepath, output_path, cache=None, streaming_threshold=STREAMING_THRESHOLD,
+                  content_dir=None, source=None, writer=None, minifier=None):
+    # Returns the files the page was rendered from besides its source
+    # ("deps"), its title and front matter ("meta") and the [url, line] of
+    # every link in its content ("links").
+    # With a writer (an IOPipeline), the page is handed over for writing and
+    # the output directory must already exist. Outputs whose bytes did not
+    # change are not rewritten.
+    links = []
+    with PROFILER.span("page", from_path):
+        context = page_context(from_path, basepath, cache, streaming_threshold, source, links)
+        root = os.path.dirname(template_path)
+        template_path, probed = template_for(from_path, content_dir, template_path, context)
+        #print(basepath)
+        print(f"Generating page from {from_path} to {basepath} using {template_path}")
+        template = load_template(template_path, basepath, root)
+
+        dirpath = os.path.dirname(output_path)
+        if writer is None and dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        if not isinstance(context["Content"], MarkdownStream):
+            with PROFILER.span("render"):
+                html = template.render(context)
+            if minifier is not None:
+                with PROFILER.span("minify"):
+                    html = minifier.minify_counted(html, "html")
+            if writer is not None:
+                writer.write(output_path, html)
+            else:
+                write_output(output_path, html)
+        else:
+            # Streamed pages are too large to hold, so they are not minified.
+            # Output is buffered, so "render" covers template substitution and
+            # any HTML serialization still left, "write" the final flush to disk
+            tmp_path = output_path + TMP_SUFFIX
+            f = open(tmp_path, "w")
+            try:
+                with PROFILER.span("render"):
+                    template.write(f, context)
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+            with PROFILER.span("write"):
+                f.close()
+                if writer is not None:
+                    writer.replace(tmp_path, output_path)
+                else:
+                    replace_output(tmp_path, output_path)
+    deps = list(template.dependencies)
+    deps.extend(path for path in probed if path not in deps)
+    meta = {key: value for key, value in context.items() if key != "Content"}
+    return {"deps": deps, "meta": meta, "links": links}
 
 def content_copy(content_path,template_path, dest):
-    if not os.path.exists(content_path):
-        raise Exception("Error: Path is not existing")
-    items_list = os.listdir(content_path)
-
-    for item in items_list:
-        path = os.path.join(content_path, item)
-        if not os.path.isfile(path):
-            new_dest = os.path.join(dest, item)
-            os.makedirs(new_dest, exist_ok=True)
-            content_copy(path, template_path, new_dest)
-        elif path.endswith(".md"):
-            out_name = item.replace(".md", ".html")
-            out_path = os.path.join(dest, out_name)
-            os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            generate_page(path,template_path,out_path)
+    for path, output_path in collect_pages(content_path, dest):
+        generate_page(path, template_path, "/", output_path)
 
-def generate_pages_recursive(dir_path_content, template_path, basepath, dest_dir_path):
-    if not os.path.exists(dir_path_content):
-        raise Exception("Error: Path is not existing")
-
-    for item in os.listdir(dir_path_content):
-        path = os.path.join(dir_path_content, item)
+def output_path_for(item, dest_dir_path):
+    if item == "index.md":
+        return os.path.join(dest_dir_path, "index.html")
+    return os.path.join(dest_dir_path, item.replace(".md", ".html"))
 
-        if os.path.isdir(path):
-            # Recurse into subdir; dest is a directory path
-            generate_pages_recursive(path, template_path, basepath, os.path.join(dest_dir_path, item))
+def output_path_for_rel(rel, dest_dir_path):
+    dirname, item = os.path.split(rel)
+    return output_path_for(item, os.path.join(dest_dir_path, dirname) if dirname else dest_dir_path)
 
-        elif os.path.isfile(path) and item.endswith(".md"):
-            if item == "index.md":
-                output_path = os.path.join(dest_dir_path, "index.html")
-            else:
-                output_path = os.path.join(dest_dir_path, item.replace(".md", ".html"))
-            generate_page(path, template_path, basepath, output_path)
+def pages_from_files(files, dir_path_content, dest_dir_path):
+    # files is what walk_files or FileIndex.scan returned for dir_path_content
+    return [(os.path.join(dir_path_content, rel), output_path_for_rel(rel, dest_dir_path))
+            for rel in files if rel.endswith(".md")]
 
+def collect_pages(dir_path_content, dest_dir_path):
+    return pages_from_files(walk_files(dir_path_content), dir_path_content, dest_dir_path)
 
-        
+def generate_pages_recursive(dir_path_content, template_path, basepath, dest_dir_path):
+    for path, output_path in collect_pages(dir_path_content, dest_dir_path):
+        generate_page(path, template_path, basepath, output_path)
@@ -1,24 +1,55 @@
 from textnode import TextNode, TextType
 
+URL_ATTRIBUTES = ("href", "src")
 
-
+def rewrite_url(url, basepath):
+    # Root-relative URLs are served below basepath; protocol-relative and
+    # absolute URLs are left alone
+    if not basepath or basepath == "/" or not url.startswith("/") or url.startswith("//"):
+        return url
+    return basepath + url[1:]
 
 
 class HTMLNode:
+    # Pages create tens of thousands of nodes; slots keep each one a fixed
+    # four-pointer record instead of carrying a per-instance __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag = None, value = None, children = None, props = None):
         self.tag = tag
         self.value = value
         self.children = children
         self.props = props
 
-    def to_html(self):
+    def to_html(self, basepath=None):
+        return "".join(self.iter_html(basepath))
+
+    def write_html(self, sink, basepath=None):
+        write = sink.write
+        for fragment in self.iter_html(basepath):
+            write(fragment)
+
+    def iter_html(self, basepath=None):
+        # Walk the tree with an explicit stack so deep documents neither
+        # recurse nor build intermediate strings for every subtree
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                yield item
+            else:
+                stack.extend(reversed(item.html_parts(basepath)))
+
+    def html_parts(self, basepath=None):
         raise NotImplementedError
     
-    def props_to_html(self):
+    def props_to_html(self, basepath=None):
         if not self.props:
             return ""
         parts = []
         for key, val in self.props.items():
+            if basepath and key in URL_ATTRIBUTES:
+                val = rewrite_url(val, basepath)
             parts.append(f'{key}="{val}"')
         return " "+" ".join(parts)
     
@@ -27,28 +58,29 @@ class HTMLNode:
     
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value=None, props=None):
         super().__init__(tag, value, None, props)
 
-    def to_html(self):
+    def html_parts(self, basepath=None):
         if self.value is None:
             raise ValueError("Leaf nodes must have a value")
         if self.tag is None:
-            return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            return [self.value]
+        return [f"<{self.tag}{self.props_to_html(basepath)}>", self.value, f"</{self.tag}>"]
     
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props = None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def html_parts(self, basepath=None):
         if self.tag is None:
             raise ValueError("Parent nodes must have a tag")
         if self.children is None:
             raise ValueError("Parent node must have a children")
-        node = ""
-        for item in self.children:
-            node += item.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{node}</{self.tag}>"
\ No newline at end of file
+        return [f"<{self.tag}{self.props_to_html(basepath)}>", *self.children, f"</{self.tag}>"]
\ No newline at end of file
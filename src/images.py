@@ -0,0 +1,158 @@
+import hashlib
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from htmlnode import rewrite_url
+from manifest import CACHE_DIR, hash_file
+from profiler import profiled
+from staticsync import signature, sync_file, is_unchanged, remove_output
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+# Widths of the resized variants; only those narrower than the original are made
+VARIANT_WIDTHS = (480, 960, 1440)
+JPEG_QUALITY = 80
+# Part of every variant cache key; bump when the resizing or encoding changes
+VARIANT_VERSION = "1"
+
+def image_size(path):
+    # Width and height read from the file header, without decoding pixels
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_size(f)
+    return None
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        # Start-of-frame markers carry the dimensions; C4, C8 and CC do not
+        if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, 1)
+
+def variant_name(rel, width):
+    stem, ext = os.path.splitext(rel)
+    return f"{stem}-{width}w{ext}"
+
+def variant_key(file_hash, width):
+    return hashlib.sha256(f"{file_hash}:{width}:{JPEG_QUALITY}:{VARIANT_VERSION}".encode()).hexdigest()
+
+def make_variant(job):
+    # Runs in a worker process; writes the resized image into the cache
+    src, cache_path, width = job
+    with Image.open(src) as image:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        options = {"optimize": True}
+        if image.format == "JPEG":
+            options.update(quality=JPEG_QUALITY, progressive=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        resized.save(tmp_path, format=image.format, **options)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+def image_attributes(url, size, variants, basepath):
+    # variants holds (url, width) pairs narrower than the original
+    width, height = size
+    attributes = {"width": str(width), "height": str(height)}
+    if variants:
+        candidates = [f"{rewrite_url(variant, basepath)} {w}w" for variant, w in variants]
+        candidates.append(f"{rewrite_url(url, basepath)} {width}w")
+        attributes["srcset"] = ", ".join(candidates)
+        attributes["sizes"] = f"(max-width: {width}px) 100vw, {width}px"
+    return attributes
+
+@profiled("images")
+def process_images(static_dir, static, dest_dir, basepath, old_images, cache_dir=IMAGE_CACHE_DIR, jobs=1,
+                   link=True):
+    # static is the new static table from sync_static; old_images is what this
+    # returned last build. Variants are cached by source hash and width, so an
+    # image is only ever resized once, and copied next to the original in dest.
+    # Without Pillow, pages still get width and height, but no srcset.
+    old_images = old_images or {}
+    old_sources = old_images.get("sources", {})
+    sources = {}
+    attributes = {}
+    outputs = []
+    pending = []
+    copies = []
+    for rel, record in sorted(static.items()):
+        if not rel.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        src = os.path.join(static_dir, rel)
+        previous = old_sources.get(rel)
+        if previous is not None and previous["signature"] == record:
+            source = previous
+        else:
+            size = image_size(src)
+            source = {"signature": record, "hash": hash_file(src), "size": list(size) if size else None}
+        sources[rel] = source
+        if source["size"] is None:
+            continue
+        url = "/" + rel.replace(os.sep, "/")
+        variants = []
+        if Image is not None:
+            for width in VARIANT_WIDTHS:
+                if width >= source["size"][0]:
+                    break
+                cache_path = os.path.join(cache_dir, variant_key(source["hash"], width) + os.path.splitext(rel)[1])
+                if not os.path.exists(cache_path):
+                    pending.append((src, cache_path, width))
+                dest_rel = variant_name(rel, width)
+                copies.append((cache_path, os.path.join(dest_dir, dest_rel)))
+                variants.append(("/" + dest_rel.replace(os.sep, "/"), width))
+        attributes[url] = image_attributes(url, source["size"], variants, basepath)
+
+    if pending:
+        os.makedirs(cache_dir, exist_ok=True)
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as executor:
+                list(executor.map(make_variant, pending))
+        else:
+            for job in pending:
+                make_variant(job)
+    copied = 0
+    for cache_path, dest in copies:
+        if not is_unchanged(signature(os.stat(cache_path)), dest, None):
+            sync_file(cache_path, dest, link)
+            copied += 1
+        outputs.append(dest)
+    current = set(outputs)
+    for path in old_images.get("outputs", []):
+        if path not in current:
+            remove_output(path, dest_dir)
+
+    note = "" if Image is not None else " (Pillow not installed: sizes only, no variants)"
+    print(f"Images: {len(attributes)} sized, {len(pending)} variants generated, {len(copies) - len(pending)} cached, "
+          f"{copied} copied{note}")
+    return {"sources": sources, "outputs": outputs, "attributes": attributes}
+
+def changed_images(old_images, images):
+    # The srcs whose <img> attributes differ between two builds; only pages
+    # referencing one of them have to be rendered again
+    old = old_images.get("attributes", {}) if old_images else {}
+    new = images["attributes"]
+    return {url for url in old.keys() | new.keys() if old.get(url) != new.get(url)}
@@ -0,0 +1,113 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from profiler import PROFILER
+
+DEFAULT_IO_THREADS = 8
+TMP_SUFFIX = ".ssg-tmp"
+
+def make_output_dirs(paths):
+    # One makedirs per distinct directory instead of one per page
+    for dirpath in sorted({os.path.dirname(path) for path in paths}):
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+
+def read_source(path, max_size=None):
+    # Files of max_size bytes or more are left to the streaming renderer
+    with PROFILER.span("read"):
+        if max_size is not None and os.path.getsize(path) >= max_size:
+            return None
+        with open(path) as f:
+            return f.read()
+
+def same_contents(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+def same_files(a, b):
+    try:
+        if os.path.getsize(a) != os.path.getsize(b):
+            return False
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            while True:
+                chunk = fa.read(1 << 16)
+                if chunk != fb.read(1 << 16):
+                    return False
+                if not chunk:
+                    return True
+    except OSError:
+        return False
+
+def write_output(path, text):
+    # Leaves a file that already holds these exact bytes alone, so its mtime
+    # survives; otherwise writes next to it and renames, so a crashed build
+    # never leaves a half-written page. Returns whether the file was written.
+    with PROFILER.span("write"):
+        data = text.encode("utf-8")
+        if same_contents(path, data):
+            return False
+        tmp_path = path + TMP_SUFFIX
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+
+def replace_output(tmp_path, path):
+    # The same for a page that was streamed into tmp_path
+    if same_files(tmp_path, path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+class IOPipeline:
+    # Reads sources ahead of the renderer and writes outputs behind it on a
+    # small thread pool. At most 2 * threads reads and 2 * threads writes are
+    # in flight; results are always consumed in input order.
+    def __init__(self, threads=DEFAULT_IO_THREADS, max_size=None):
+        self.threads = max(1, threads)
+        self.max_size = max_size
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.writes = deque()
+        self.errors = {}
+        self.unchanged = set()
+
+    def prefetch(self, paths):
+        # Yields one future per path, in order; result() raises read errors
+        pending = deque()
+        for path in paths:
+            pending.append(self.executor.submit(read_source, path, self.max_size))
+            if len(pending) >= self.threads * 2:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+    def write(self, path, text):
+        self.writes.append((path, self.executor.submit(write_output, path, text)))
+        while len(self.writes) > self.threads * 2:
+            self._finish_write()
+
+    def replace(self, tmp_path, path):
+        if not replace_output(tmp_path, path):
+            self.unchanged.add(path)
+
+    def _finish_write(self):
+        path, future = self.writes.popleft()
+        try:
+            if not future.result():
+                self.unchanged.add(path)
+        except Exception as e:
+            self.errors[path] = f"{type(e).__name__}: {e}"
+
+    def close(self):
+        # Waits for every pending write; returns the write errors by output path
+        while self.writes:
+            self._finish_write()
+        self.executor.shutdown()
+        return self.errors
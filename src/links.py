@@ -0,0 +1,63 @@
+import os
+import posixpath
+import re
+from urllib.parse import unquote
+
+from profiler import profiled
+
+LINK_MODES = ("warn", "error", "off")
+# Links with a scheme (https:, mailto:, data:, ...) point outside the site
+_SCHEME = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*:")
+
+def output_url(path, dest_dir):
+    # docs/blog/tom/index.html -> /blog/tom/index.html
+    prefix = os.path.join(dest_dir, "")
+    rel = path[len(prefix):] if path.startswith(prefix) else os.path.relpath(path, dest_dir)
+    return "/" + rel.replace(os.sep, "/")
+
+def link_target(url, page_url):
+    # The root-relative path a link points at, or None for links the build
+    # does not own: other sites, mailto:, in-page #fragments
+    if not url or url.startswith(("#", "//")) or _SCHEME.match(url):
+        return None
+    path = unquote(url.split("#", 1)[0].split("?", 1)[0])
+    if not path:
+        return None
+    directory = path.endswith("/")
+    if not path.startswith("/"):
+        path = posixpath.join(posixpath.dirname(page_url), path)
+    path = posixpath.normpath(path)
+    if path.startswith("//"):
+        path = path[1:]
+    return path.rstrip("/") + "/" if directory and path != "/" else path
+
+def resolves(target, targets):
+    # /blog/tom is served from /blog/tom/index.html, as is /blog/tom/
+    if target.endswith("/"):
+        return target + "index.html" in targets
+    return target in targets or target + "/index.html" in targets or target + ".html" in targets
+
+@profiled("links")
+def check_links(pages, targets, dest_dir, sources=None):
+    # pages is the manifest's page table, whose entries carry the [url, line]
+    # pairs collected while rendering; targets holds the output_url of every
+    # file the build owns. Checks the pages in sources (all by default) with
+    # set lookups only and returns the broken links as (source, line, url).
+    broken = []
+    checked = 0
+    for source in sorted(pages if sources is None else sources):
+        entry = pages.get(source)
+        if entry is None or not entry.get("links"):
+            continue
+        page_url = output_url(entry["output"], dest_dir)
+        for url, line in entry["links"]:
+            target = link_target(url, page_url)
+            if target is None:
+                continue
+            checked += 1
+            if not resolves(target, targets):
+                broken.append((source, line, url))
+    for source, line, url in broken:
+        print(f"Warning: {source}:{line}: broken link to {url}")
+    print(f"Links: {checked} internal links checked, {len(broken)} broken")
+    return broken
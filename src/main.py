@@ -1,12 +1,77 @@
-from textnode import TextNode, TextType
-from functions import copy_static_content, initial_setup, generate_page, content_copy, generate_pages_recursive
+from build import build_site, BuildError, PARSE_CACHE_DIR
+from links import LINK_MODES
+from iopipeline import DEFAULT_IO_THREADS
+from profiler import PROFILER
+from depgraph import DepGraph, DEPS_PATH
+import argparse
 import sys
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site into docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--clean", action="store_true", help="ignore the build manifest and rebuild everything")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="render pages in N worker processes (0 = one per CPU core)")
+    parser.add_argument("--io-threads", type=int, default=DEFAULT_IO_THREADS, metavar="N",
+                        help=f"read sources and write pages on N threads per process (default {DEFAULT_IO_THREADS})")
+    parser.add_argument("--no-cache", action="store_true", help="always re-parse markdown instead of using the parse cache")
+    parser.add_argument("--no-link", action="store_true", help="copy static files instead of hard-linking or cloning them")
+    parser.add_argument("--profile", nargs="?", type=int, const=10, default=None, metavar="N",
+                        help="print per-stage timings and the N slowest pages (default 10)")
+    parser.add_argument("--trace", metavar="FILE", help="with --profile, also write a Chrome trace-event JSON file")
+    parser.add_argument("--no-images", action="store_true",
+                        help="leave <img> tags as written: no width, height or resized variants")
+    parser.add_argument("--minify", action="store_true",
+                        help="minify HTML pages and CSS files (pages above the streaming threshold are left as rendered)")
+    parser.add_argument("--links", choices=LINK_MODES, default="warn",
+                        help="report broken internal links and missing assets (warn), also fail the build (error), or skip the check")
+    parser.add_argument("--drafts", action="store_true", help="also build pages marked draft: true in their front matter")
+    parser.add_argument("--site-url", default="", metavar="URL",
+                        help="absolute site URL, e.g. https://example.github.io; sitemap.xml and feed.xml are only written with one")
+    parser.add_argument("--why", metavar="OUTPUT", help="show why OUTPUT was last rebuilt and what it depends on, then exit")
+    parser.add_argument("--dependents", metavar="PATH", help="list the outputs built from a template, partial or data file, then exit")
+    return parser.parse_args(argv)
+
+def explain(args, graph):
+    if args.why:
+        entry = graph.why(args.why)
+        if entry is None:
+            print(f"No dependency record for {args.why}")
+            return False
+        print(f"{args.why}: {entry['reason']}")
+        print(f"  source: {entry['source']}")
+        for dep in entry["deps"]:
+            print(f"  depends on: {dep}")
+    if args.dependents:
+        outputs = graph.dependents(args.dependents)
+        print(f"{len(outputs)} output(s) depend on {args.dependents}")
+        for output in outputs:
+            print(f"  {output}")
+    return True
+
 def main():
-    basepath = sys.argv[1] if len(sys.argv)>=2 else "/"
+    args = parse_args()
     relative_path_static = "static"
     output_dir = "docs"
     relative_path_content = "content"
-    initial_setup(output_dir)
-    generate_pages_recursive(relative_path_content, "template.html", basepath, output_dir)
-main()
\ No newline at end of file
+    if args.why or args.dependents:
+        sys.exit(0 if explain(args, DepGraph.load(DEPS_PATH)) else 1)
+    if args.profile is not None or args.trace:
+        PROFILER.enable(trace=bool(args.trace))
+    try:
+        build_site(relative_path_content, "template.html", relative_path_static, args.basepath, output_dir,
+                   clean=args.clean, jobs=args.jobs, cache_dir=None if args.no_cache else PARSE_CACHE_DIR, link_static=not args.no_link,
+                   io_threads=args.io_threads, site_url=args.site_url,
+                   images=not args.no_images, minify=args.minify, links=args.links,
+                   drafts=args.drafts)
+    except BuildError as e:
+        print(f"Build failed: {e}")
+        sys.exit(1)
+    finally:
+        if PROFILER.enabled:
+            PROFILER.report(args.profile or 10)
+            if args.trace:
+                PROFILER.write_trace(args.trace)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+# Bump whenever a change to the generator changes the HTML it writes, so that
+# existing outputs built by an older version get regenerated.
+GENERATOR_VERSION = "9"
+
+CACHE_DIR = ".ssg_cache"
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def new_manifest(basepath, minify=False):
+    return {
+        "version": GENERATOR_VERSION,
+        "basepath": basepath,
+        "minify": minify,
+        "pages": {},
+        # Draft pages left out of the build, with the metadata read for them
+        "drafts": {},
+        "static": {},
+        "generated": [],
+        # Per taxonomy, the digest and output files of every term's pages
+        "taxonomy": {},
+        "images": {"sources": {}, "outputs": [], "attributes": {}},
+    }
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict):
+        return None
+    return manifest
+
+def save_json(obj, path, compact=False):
+    # Written to a temporary file and renamed over path, so a build that is
+    # interrupted leaves the previous file intact rather than a truncated one
+    dirpath = os.path.dirname(path)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        if compact:
+            json.dump(obj, f, separators=(",", ":"))
+        else:
+            json.dump(obj, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    save_json(manifest, path)
+
+def full_rebuild_reason(manifest, basepath, minify=False):
+    # Template changes are not listed here: the dependency graph tracks
+    # which pages each template, partial and data file affects
+    if manifest is None:
+        return "no manifest"
+    if manifest.get("version") != GENERATOR_VERSION:
+        return "generator version changed"
+    if manifest.get("basepath") != basepath:
+        return "basepath changed"
+    if manifest.get("minify", False) != minify:
+        return "minify setting changed"
+    return None
@@ -0,0 +1,119 @@
+import os
+import re
+
+from manifest import CACHE_DIR
+from parsecache import ParseCache
+from staticsync import format_bytes
+
+MINIFY_CACHE_DIR = os.path.join(CACHE_DIR, "minify")
+# Part of every minify cache key; bump whenever the minifiers change output
+MINIFY_VERSION = "1"
+
+# Whitespace inside these elements is kept exactly as written
+_PRESERVED = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[A-Za-z][^>]*>")
+_ATTRIBUTE = re.compile(r"""\s*([^\s=/>"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?""")
+_WHITESPACE = re.compile(r"\s+")
+# Whitespace next to block-level tags never renders, around inline tags it does
+_BLOCK_TAGS = ("html|head|body|title|meta|link|script|style|article|section|nav|header|footer|main|aside|div|p|"
+               "ul|ol|li|h[1-6]|blockquote|pre|table|thead|tbody|tr|td|th|hr|br|figure|figcaption")
+_AROUND_BLOCK = re.compile(rf"\s*(<!doctype[^>]*>|</?(?:{_BLOCK_TAGS})\b[^>]*>)\s*", re.IGNORECASE)
+
+def _collapse_tag(match):
+    tag = match.group(0)
+    end = "/>" if tag.endswith("/>") else ">"
+    body = tag[1:-len(end)]
+    name = re.match(r"[^\s/>]+", body).group(0)
+    parts = [name]
+    for attr in _ATTRIBUTE.finditer(body[len(name):]):
+        if attr.group(1):
+            parts.append(attr.group(1) if attr.group(2) is None else f"{attr.group(1)}={attr.group(2)}")
+    return "<" + " ".join(parts) + end
+
+def minify_html(html):
+    pieces = _PRESERVED.split(html)
+    out = []
+    # split with two groups gives text, element, tag name, text, ...
+    for idx in range(0, len(pieces), 3):
+        # Attribute values keep their whitespace; only text between tags and
+        # the spacing between attributes collapse
+        parts = []
+        end = 0
+        for tag in _TAG.finditer(pieces[idx]):
+            parts.append(_WHITESPACE.sub(" ", pieces[idx][end:tag.start()]))
+            parts.append(_collapse_tag(tag))
+            end = tag.end()
+        parts.append(_WHITESPACE.sub(" ", pieces[idx][end:]))
+        out.append(_AROUND_BLOCK.sub(r"\1", "".join(parts)))
+        if idx + 1 < len(pieces):
+            out.append(pieces[idx + 1])
+    return "".join(out).strip()
+
+_CSS_TOKENS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)|([^"'/\s]+|/)""", re.DOTALL)
+# No space is needed on either side of these; ":" only loses the space after
+# it, since "a :hover" and "a:hover" are different selectors
+_CSS_TIGHT = set("{};,>")
+
+def minify_css(css):
+    out = []
+    pending_space = False
+    for string, comment, space, other in _CSS_TOKENS.findall(css):
+        if comment:
+            continue
+        if space:
+            pending_space = True
+            continue
+        token = string or other.replace(";}", "}")
+        if pending_space and out and out[-1][-1] not in _CSS_TIGHT and out[-1][-1] != ":" \
+                and token[0] not in _CSS_TIGHT:
+            out.append(" ")
+        pending_space = False
+        if token[0] == "}" and out and out[-1].endswith(";"):
+            out[-1] = out[-1][:-1]
+        out.append(token)
+    return "".join(out)
+
+MINIFIERS = {"html": minify_html, "css": minify_css}
+
+class Minifier:
+    # Minifies by content hash through a ParseCache-style store, and tallies
+    # the bytes saved per file type
+    def __init__(self, cache_dir=MINIFY_CACHE_DIR):
+        self.cache = ParseCache(cache_dir) if cache_dir else None
+        self.stats = {}
+
+    def minify(self, text, kind):
+        if self.cache is None:
+            return MINIFIERS[kind](text)
+        key = self.cache.key(text, kind, MINIFY_VERSION)
+        result = self.cache.get(key)
+        if result is None:
+            result = MINIFIERS[kind](text)
+            self.cache.put(key, result)
+        return result
+
+    def minify_counted(self, text, kind):
+        # Minifies a whole page or stylesheet and counts it in the stats
+        before = len(text.encode("utf-8"))
+        text = self.minify(text, kind)
+        self.record(kind, before, len(text.encode("utf-8")))
+        return text
+
+    def record(self, kind, before, after, files=1):
+        total = self.stats.setdefault(kind, [0, 0, 0])
+        total[0] += files
+        total[1] += before
+        total[2] += after
+
+    def merge(self, stats):
+        # Stats counted by a copy of this minifier in a worker process
+        for kind, (files, before, after) in stats.items():
+            self.record(kind, before, after, files)
+
+    def report(self):
+        for kind, (files, before, after) in sorted(self.stats.items()):
+            saved = before - after
+            percent = 100 * saved / before if before else 0
+            print(f"Minified {kind}: {files} files, {format_bytes(before)} -> {format_bytes(after)} "
+                  f"(saved {format_bytes(saved)}, {percent:.1f}%)")
+        self.stats = {}
@@ -0,0 +1,107 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+class ParseCache:
+    # On-disk cache of rendered markdown fragments, keyed by content hash.
+    # Entries are touched on every hit so that eviction can drop the least
+    # recently used ones first.
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, markdown, *parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode())
+            h.update(b"\0")
+        h.update(markdown.encode())
+        return h.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key + ".html")
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return html
+
+    def put(self, key, html):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".html"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def prune(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+class MemoryCache:
+    # Keeps the most recently used fragments of a ParseCache in memory, for
+    # long-running processes that re-render the same pages over and over
+    def __init__(self, cache, max_entries=10000):
+        self.cache = cache
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def key(self, markdown, *parts):
+        return self.cache.key(markdown, *parts)
+
+    def get(self, key):
+        html = self.entries.get(key)
+        if html is not None:
+            self.entries.move_to_end(key)
+            return html
+        html = self.cache.get(key)
+        if html is not None:
+            self._remember(key, html)
+        return html
+
+    def put(self, key, html):
+        self.cache.put(key, html)
+        self._remember(key, html)
+
+    def _remember(self, key, html):
+        self.entries[key] = html
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def prune(self):
+        return self.cache.prune()
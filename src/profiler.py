@@ -0,0 +1,121 @@
+import functools
+import json
+import os
+import threading
+import time
+
+class _Span:
+    __slots__ = ("profiler", "stage", "detail", "start")
+
+    def __init__(self, profiler, stage, detail):
+        self.profiler = profiler
+        self.stage = stage
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.stage, self.start, time.perf_counter_ns(), self.detail)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Profiler:
+    # Collects per-stage totals, per-page durations and, optionally, every
+    # span as a Chrome trace event. Disabled, a span is a shared no-op object.
+    def __init__(self):
+        self.enabled = False
+        self.trace = False
+        # Spans are also recorded from I/O threads
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.totals = {}
+        self.pages = {}
+        self.events = []
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.trace = trace
+
+    def span(self, stage, detail=None):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, detail)
+
+    def record(self, stage, start, end, detail=None):
+        with self.lock:
+            self._record(stage, start, end, detail)
+
+    def _record(self, stage, start, end, detail):
+        elapsed = end - start
+        total = self.totals.get(stage)
+        if total is None:
+            self.totals[stage] = [elapsed, 1]
+        else:
+            total[0] += elapsed
+            total[1] += 1
+        if stage == "page" and detail is not None:
+            self.pages[detail] = self.pages.get(detail, 0) + elapsed
+        if self.trace:
+            event = {"name": stage, "ph": "X", "ts": start / 1000, "dur": elapsed / 1000,
+                     "pid": os.getpid(), "tid": threading.get_ident()}
+            if detail is not None:
+                event["args"] = {"path": detail}
+            self.events.append(event)
+
+    def snapshot(self):
+        data = {"totals": self.totals, "pages": self.pages, "events": self.events}
+        self.reset()
+        return data
+
+    def merge(self, data):
+        for stage, (elapsed, count) in data["totals"].items():
+            total = self.totals.setdefault(stage, [0, 0])
+            total[0] += elapsed
+            total[1] += count
+        for path, elapsed in data["pages"].items():
+            self.pages[path] = self.pages.get(path, 0) + elapsed
+        self.events.extend(data["events"])
+
+    def report(self, top=10):
+        print("\nStage totals (stages nest: page includes read, parse, write, ...):")
+        for stage, (elapsed, count) in sorted(self.totals.items(), key=lambda item: -item[1][0]):
+            print(f"  {stage:<12} {elapsed / 1e6:10.2f} ms  {count:8d} calls  {elapsed / count / 1e3:10.1f} us/call")
+        if self.pages:
+            print(f"\nSlowest {min(top, len(self.pages))} pages:")
+            for path, elapsed in sorted(self.pages.items(), key=lambda item: -item[1])[:top]:
+                print(f"  {elapsed / 1e6:10.2f} ms  {path}")
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        print(f"Trace with {len(self.events)} events written to {path}")
+
+PROFILER = Profiler()
+
+def profiled(stage):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.record(stage, start, time.perf_counter_ns())
+        return wrapper
+    return decorate
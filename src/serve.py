@@ -0,0 +1,150 @@
+from build import Builder, BuildError
+from watch import create_watcher
+from template import TEMPLATES_DIR, PARTIALS_DIR, DATA_DIR
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import os
+import threading
+import time
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = (
+    "<script>new EventSource(\"" + RELOAD_PATH + "\")"
+    ".onmessage = function () { location.reload(); };</script>"
+)
+
+class LiveReload:
+    def __init__(self):
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, reload=None, basepath="/", **kwargs):
+        self.reload = reload
+        self.basepath = basepath
+        super().__init__(*args, **kwargs)
+
+    def translate_path(self, path):
+        # Pages link to basepath-prefixed URLs; serve them from the root of docs/
+        if self.basepath != "/" and path.startswith(self.basepath):
+            path = "/" + path[len(self.basepath):]
+        return super().translate_path(path)
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH:
+            return self.serve_reload_events()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            return self.serve_html(path)
+        return super().do_GET()
+
+    def serve_html(self, path):
+        with open(path, "rb") as f:
+            body = f.read()
+        script = RELOAD_SCRIPT.encode()
+        if b"</body>" in body:
+            body = body.replace(b"</body>", script + b"</body>", 1)
+        else:
+            body += script
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def serve_reload_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        generation = self.reload.generation
+        try:
+            while True:
+                current = self.reload.wait(generation, timeout=15)
+                if current != generation:
+                    self.wfile.write(b"data: reload\n\n")
+                    generation = current
+                else:
+                    # Comment line keeps idle connections open through proxies
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        if self.path != RELOAD_PATH:
+            super().log_message(format, *args)
+
+def watch_and_rebuild(builder, watcher, reload):
+    while True:
+        changed = watcher.wait()
+        if not changed:
+            continue
+        start = time.perf_counter()
+        try:
+            failures = builder.rebuild_paths(changed)
+        except Exception as e:
+            print(f"Error: rebuild failed: {e}")
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Rebuilt {len(changed)} changed path(s) in {elapsed:.1f} ms")
+        if not failures:
+            reload.notify()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve docs/ locally, optionally rebuilding on change")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--watch", action="store_true", help="re-render changed pages and reload the browser")
+    parser.add_argument("--poll", action="store_true", help="poll for changes instead of using inotify")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--bind", default="127.0.0.1")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    relative_path_static = "static"
+    output_dir = "docs"
+    relative_path_content = "content"
+    template_path = "template.html"
+    builder = Builder(relative_path_content, template_path, relative_path_static, args.basepath, output_dir)
+    try:
+        builder.build()
+    except BuildError as e:
+        print(f"Build failed: {e}")
+
+    reload = LiveReload()
+    if args.watch:
+        roots = [relative_path_content, relative_path_static, template_path]
+        # Section templates, partials and data files, when the site has them
+        roots.extend(path for path in (TEMPLATES_DIR, PARTIALS_DIR, DATA_DIR) if os.path.isdir(path))
+        watcher = create_watcher(roots, polling=args.poll)
+        thread = threading.Thread(target=watch_and_rebuild, args=(builder, watcher, reload), daemon=True)
+        thread.start()
+
+    handler = partial(DevRequestHandler, directory=output_dir, reload=reload, basepath=args.basepath)
+    server = ThreadingHTTPServer((args.bind, args.port), handler)
+    server.daemon_threads = True
+    print(f"Serving {output_dir} at http://{args.bind}:{args.port}{args.basepath}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from fileindex import walk_files
+from iopipeline import write_output
+from profiler import profiled
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ioctl request number for a copy-on-write clone on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+DEFAULT_COPY_THREADS = 8
+
+def collect_static(static_dir):
+    return list(walk_files(static_dir))
+
+def signature(stat):
+    return [stat.st_size, stat.st_mtime_ns]
+
+def is_unchanged(src_signature, dest, record):
+    try:
+        dest_stat = os.stat(dest)
+    except OSError:
+        return False
+    if record is not None:
+        return record == src_signature
+    # No record from a previous build: trust an identical size and mtime,
+    # which is what every sync method below leaves behind
+    return signature(dest_stat) == src_signature
+
+def _reflink(src, tmp_path):
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    shutil.copystat(src, tmp_path)
+    return True
+
+def sync_file(src, dest, link=True):
+    dirpath = os.path.dirname(dest)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    # Write next to the destination and rename, so readers never see a partial file
+    tmp_path = dest + ".ssg-tmp"
+    method = "copy"
+    same_device = link and os.stat(src).st_dev == os.stat(dirpath or ".").st_dev
+    if same_device and _reflink(src, tmp_path):
+        method = "reflink"
+    else:
+        linked = False
+        if same_device:
+            try:
+                os.link(src, tmp_path)
+                linked = True
+                method = "link"
+            except OSError:
+                pass
+        if not linked:
+            shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dest)
+    return method
+
+def minify_file(src, dest, minifier):
+    # Writes a minified stylesheet instead of a copy; returns whether dest changed
+    with open(src) as f:
+        text = f.read()
+    minified = minifier.minify_counted(text, "css")
+    dirpath = os.path.dirname(dest)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    return write_output(dest, minified)
+
+def is_minified(rel, minifier):
+    return minifier is not None and rel.lower().endswith(".css")
+
+@profiled("static")
+def sync_static(static_dir, dest_dir, old_static, jobs=DEFAULT_COPY_THREADS, link=True, minifier=None, files=None):
+    # files is the static_dir listing from walk_files or a FileIndex scan,
+    # when the caller already has one
+    new_static = {}
+    pending = []
+    minified = []
+    skipped_bytes = 0
+    if files is None:
+        files = walk_files(static_dir)
+    for rel, record in files.items():
+        src = os.path.join(static_dir, rel)
+        dest = os.path.join(dest_dir, rel)
+        size = record[0]
+        new_static[rel] = record[:2]
+        # A minified file never matches its source's size, so without a
+        # record it is minified again (the result is cached by content)
+        if is_unchanged(record[:2], dest, old_static.get(rel)) and (rel in old_static or not is_minified(rel, minifier)):
+            skipped_bytes += size
+        elif is_minified(rel, minifier):
+            minified.append((src, dest, size))
+        else:
+            pending.append((src, dest, size))
+
+    copied_bytes = sum(size for _, _, size in pending)
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as executor:
+            # list() re-raises the first copy error, if any
+            list(executor.map(lambda item: sync_file(item[0], item[1], link), pending))
+    for src, dest, _ in minified:
+        minify_file(src, dest, minifier)
+    pending.extend(minified)
+
+    removed = 0
+    for rel in old_static:
+        if rel not in new_static:
+            remove_output(os.path.join(dest_dir, rel), dest_dir)
+            removed += 1
+
+    print(f"Static files: {len(pending)} copied ({format_bytes(copied_bytes)}), "
+          f"{len(new_static) - len(pending)} skipped ({format_bytes(skipped_bytes)}), {removed} removed")
+    return new_static
+
+def remove_output(path, dest_dir_path):
+    if os.path.exists(path):
+        os.remove(path)
+    # Drop directories the removed file leaves empty, but never dest itself
+    root = os.path.abspath(dest_dir_path)
+    dirpath = os.path.dirname(os.path.abspath(path))
+    while dirpath.startswith(root + os.sep) and os.path.isdir(dirpath) and not os.listdir(dirpath):
+        os.rmdir(dirpath)
+        dirpath = os.path.dirname(dirpath)
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+from depgraph import current_hash
+from feeds import PageInfo, page_path, page_date, write_listing, newest_first
+from htmlnode import LeafNode, ParentNode
+from iopipeline import write_output
+from profiler import profiled
+from staticsync import remove_output
+from template import load_template, template_for
+
+# Front matter keys that group pages, and the title their archive pages get
+TAXONOMIES = {"tags": "Tag", "categories": "Category"}
+_SLUG_SEPARATORS = re.compile(r"[^\w]+")
+
+@lru_cache(maxsize=4096)
+def slugify(term):
+    return _SLUG_SEPARATORS.sub("-", term.lower()).strip("-")
+
+def page_terms(meta, taxonomy):
+    # tags: [a, b], a block list or "a, b" all name the same terms
+    value = meta.get(taxonomy)
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        value = [value]
+    return [str(term).strip() for term in value if str(term).strip()]
+
+def build_index(pages, dest_dir):
+    # Inverted index {taxonomy: {slug: (term, [PageInfo, ...])}} from the
+    # metadata the render recorded for each page, in one pass over the pages
+    index = {taxonomy: {} for taxonomy in TAXONOMIES}
+    for source, entry in pages.items():
+        meta = entry.get("meta")
+        if not meta:
+            continue
+        info = None
+        for taxonomy, terms in index.items():
+            # A term listed twice, or spelled two ways, adds the page once
+            slugs = {}
+            for term in page_terms(meta, taxonomy):
+                slugs.setdefault(slugify(term), term)
+            for slug, term in slugs.items():
+                if not slug:
+                    continue
+                if info is None:
+                    info = PageInfo(source, None, page_path(entry["output"], dest_dir), meta.get("Title", ""),
+                                    page_date(meta, source))
+                terms.setdefault(slug, (term, []))[1].append(info)
+    return index
+
+def term_digest(members, template_digest):
+    # Everything an archive page shows, so equal digests mean equal pages
+    h = hashlib.sha256(template_digest.encode())
+    for info in sorted(members, key=newest_first):
+        h.update(f"{info.path}\0{info.title}\0{info.date.isoformat()}\n".encode())
+    return h.hexdigest()
+
+def terms_node(taxonomy, terms):
+    items = [ParentNode("li", [LeafNode("a", f"{name} ({len(members)})", {"href": f"/{taxonomy}/{slug}/"})])
+             for slug, (name, members) in sorted(terms.items())]
+    return ParentNode("div", [ParentNode("ul", items)])
+
+@profiled("taxonomy")
+def write_taxonomies(pages, content_dir, template_path, dest_dir, basepath, old_state=None, minifier=None):
+    # Archive pages for every tag and category (tags/<slug>/, paginated like
+    # the section listings) and one page listing all terms (tags/). old_state
+    # is what this returned last build: only terms whose members, titles or
+    # dates changed are rendered again, and pages of vanished terms removed.
+    old_state = old_state or {}
+    index = build_index(pages, dest_dir)
+    reserved = {os.path.abspath(entry["output"]) for entry in pages.values()}
+    state = {}
+    summary = []
+    for taxonomy, label in TAXONOMIES.items():
+        old_terms = old_state.get(taxonomy, {})
+        terms = index[taxonomy]
+        path, probed = template_for(os.path.join(content_dir, taxonomy, "index.md"), content_dir, template_path, {})
+        template = load_template(path, basepath, os.path.dirname(template_path))
+        template_digest = "".join(f"{dep}:{current_hash(dep)};" for dep in list(template.dependencies) + probed)
+        current = {}
+        rendered = 0
+        for slug, (name, members) in sorted(terms.items()):
+            digest = term_digest(members, template_digest)
+            previous = old_terms.get(slug)
+            if previous is not None and previous["digest"] == digest and all(map(os.path.exists, previous["outputs"])):
+                current[slug] = previous
+                continue
+            outputs, _ = write_listing(dest_dir, os.path.join(taxonomy, slug), members, template, reserved, minifier,
+                                       f"{label}: {name}")
+            current[slug] = {"digest": digest, "outputs": outputs}
+            rendered += 1
+        # A hand-written content/tags/index.md takes the place of the overview
+        overview = os.path.join(dest_dir, taxonomy, "index.html")
+        own_overview = os.path.abspath(overview) not in reserved
+        if terms and own_overview:
+            html = template.render({"Title": taxonomy.capitalize(), "Content": terms_node(taxonomy, terms)})
+            if minifier is not None:
+                html = minifier.minify_counted(html, "html")
+            write_output(overview, html)
+        keep = {output for term in current.values() for output in term["outputs"]}
+        removed = 0
+        for slug, previous in old_terms.items():
+            for output in previous["outputs"]:
+                if output not in keep and os.path.abspath(output) not in reserved:
+                    remove_output(output, dest_dir)
+                    removed += 1
+        if not terms and old_terms and own_overview:
+            remove_output(overview, dest_dir)
+        state[taxonomy] = current
+        summary.append(f"{len(terms)} {taxonomy} ({rendered} rendered, {removed} pages removed)")
+    print(f"Taxonomies: {', '.join(summary)}")
+    return state
+
+def taxonomy_outputs(state, dest_dir):
+    # Every file the taxonomy stage owns, for sweeping and link checking
+    outputs = []
+    for taxonomy, terms in state.items():
+        if terms:
+            outputs.append(os.path.join(dest_dir, taxonomy, "index.html"))
+        for term in terms.values():
+            outputs.extend(term["outputs"])
+    return outputs
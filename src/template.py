@@ -0,0 +1,159 @@
+import json
+import os
+import re
+
+from htmlnode import URL_ATTRIBUTES, rewrite_url
+
+_PLACEHOLDER = re.compile(r"(\{\{\s*([A-Za-z_][\w.-]*)\s*\}\})")
+_INCLUDE = re.compile(r"\{\{>\s*([\w./-]+)\s*\}\}")
+
+TEMPLATES_DIR = "templates"
+PARTIALS_DIR = "partials"
+DATA_DIR = "data"
+
+class Template:
+    # root is the site directory holding partials/ and data/. Every file
+    # the compiled template was built from is listed in dependencies, including
+    # data files that were looked for but do not exist yet.
+    def __init__(self, text, basepath="/", root=None, path=None):
+        self.root = root
+        self.dependencies = [path] if path else []
+        if root is not None:
+            text = self._expand_includes(text, [path])
+        # re.split with two groups gives literal, raw placeholder, name, literal, ...
+        parts = _PLACEHOLDER.split(text)
+        self.literals = [rewrite_attributes(literal, basepath) for literal in parts[0::3]]
+        self.placeholders = list(zip(parts[1::3], parts[2::3]))
+        self.basepath = basepath
+        self.data = self._load_data() if root is not None else {}
+
+    def _expand_includes(self, text, stack):
+        def include(match):
+            path = os.path.join(self.root, PARTIALS_DIR, match.group(1) + ".html")
+            if path in stack:
+                raise Exception(f"Error: partial {match.group(1)} includes itself")
+            if not os.path.exists(path):
+                raise Exception(f"Error: partial {match.group(1)} not found at {path}")
+            if path not in self.dependencies:
+                self.dependencies.append(path)
+            with open(path) as f:
+                return self._expand_includes(f.read(), stack + [path])
+        return _INCLUDE.sub(include, text)
+
+    def _load_data(self):
+        # {{ site.title }} reads "title" from data/site.json
+        data = {}
+        for _, name in self.placeholders:
+            if "." not in name:
+                continue
+            source = name.split(".", 1)[0]
+            path = os.path.join(self.root, DATA_DIR, source + ".json")
+            if path in self.dependencies:
+                continue
+            self.dependencies.append(path)
+            if os.path.exists(path):
+                with open(path) as f:
+                    data[source] = json.load(f)
+        return data
+
+    def lookup(self, context, name):
+        if name in context:
+            return True, context[name]
+        value = self.data
+        for key in name.split("."):
+            if not isinstance(value, dict) or key not in value:
+                return False, None
+            value = value[key]
+        return True, value
+
+    def names(self):
+        return [name for _, name in self.placeholders]
+
+    def iter_fragments(self, context):
+        yield self.literals[0]
+        for (raw, name), literal in zip(self.placeholders, self.literals[1:]):
+            found, value = self.lookup(context, name)
+            if not found:
+                # Unknown placeholders are kept as written
+                yield raw
+            else:
+                if hasattr(value, "iter_html"):
+                    yield from value.iter_html(self.basepath)
+                else:
+                    yield format_value(value)
+            yield literal
+
+    def render(self, context):
+        return "".join(self.iter_fragments(context))
+
+    def write(self, sink, context):
+        write = sink.write
+        for fragment in self.iter_fragments(context):
+            write(fragment)
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return ", ".join(format_value(item) for item in value)
+    return str(value)
+
+def rewrite_attributes(html, basepath):
+    # Applied once per template literal at compile time, not per page
+    if not basepath or basepath == "/":
+        return html
+    for attribute in URL_ATTRIBUTES:
+        marker = f'{attribute}="'
+        pieces = html.split(marker)
+        for idx in range(1, len(pieces)):
+            end = pieces[idx].find('"')
+            url = pieces[idx] if end == -1 else pieces[idx][:end]
+            pieces[idx] = rewrite_url(url, basepath) + pieces[idx][len(url):]
+        html = marker.join(pieces)
+    return html
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+_TEMPLATE_CACHE = {}
+
+def load_template(path, basepath="/", root=None):
+    # root is the site directory holding partials/ and data/, the directory
+    # of the default template; a section template in templates/ shares it
+    if root is None:
+        root = os.path.dirname(path)
+    key = (os.path.abspath(path), basepath, os.path.abspath(root))
+    cached = _TEMPLATE_CACHE.get(key)
+    if cached is not None and all(_signature(dep) == sig for dep, sig in cached[0]):
+        return cached[1]
+    with open(path) as f:
+        template = Template(f.read(), basepath, root, path)
+    signatures = [(dep, _signature(dep)) for dep in template.dependencies]
+    _TEMPLATE_CACHE[key] = (signatures, template)
+    return template
+
+def template_for(source, content_dir, default_template, metadata):
+    # A page uses the template named in its front matter, else the template
+    # of its top-level section (templates/<section>.html), else the default.
+    # Candidates that were looked for are returned so that creating one later
+    # invalidates the page.
+    templates_dir = os.path.join(os.path.dirname(default_template), TEMPLATES_DIR)
+    name = metadata.get("template")
+    if name:
+        path = os.path.join(templates_dir, name)
+        if not os.path.exists(path):
+            raise Exception(f"Error: template {name} not found at {path}")
+        return path, []
+    probed = []
+    if content_dir is not None:
+        parts = os.path.relpath(source, content_dir).split(os.sep)
+        if len(parts) > 1:
+            candidate = os.path.join(templates_dir, parts[0] + ".html")
+            probed.append(candidate)
+            if os.path.exists(candidate):
+                return candidate, probed
+    return default_template, probed
@@ -0,0 +1,654 @@
+import io
+import os
+import tempfile
+import threading
+from contextlib import redirect_stdout
+import unittest
+
+from build import Builder, build_site, BuildError
+from daemon import BuildDaemon, create_server, send, _respond
+from depgraph import DepGraph
+from fileindex import FileIndex, walk_files
+from iopipeline import IOPipeline
+import feeds
+import images
+import struct
+import zlib
+from functions import generate_page
+from minify import minify_html, minify_css
+from parsecache import ParseCache
+from staticsync import sync_static
+from watch import InotifyWatcher, PollingWatcher
+from profiler import PROFILER
+
+def write_png(path, width, height):
+    # Smallest valid greyscale PNG of the given size
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\0" + b"\0" * width for _ in range(height))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+TEMPLATE = "<html><title>{{ Title }}</title><body>{{ Content }}</body></html>"
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, "cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nPost")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            kwargs.setdefault("cache_dir", os.path.join(self.root, "cache", "parse"))
+            return build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, **kwargs)
+
+    def test_second_build_skips_unchanged_pages(self):
+        self.build()
+        blog = os.path.join(self.docs, "blog", "index.html")
+        os.utime(blog, (0, 0))
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        self.build()
+        self.assertEqual(os.path.getmtime(blog), 0)
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn("Changed", f.read())
+
+    def test_identical_output_is_not_rewritten(self):
+        self.build()
+        home = os.path.join(self.docs, "index.html")
+        os.utime(home, (0, 0))
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n\nHello")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        self.assertEqual(os.path.getmtime(home), 0)
+        self.assertIn("Pages: 0 written, 2 skipped (1 re-rendered identical), 0 deleted, 0 failed", out.getvalue())
+
+    def test_full_rebuild_keeps_identical_outputs_and_sweeps_orphans(self):
+        self.build()
+        os.remove(self.manifest)
+        home = os.path.join(self.docs, "index.html")
+        os.utime(home, (0, 0))
+        orphan = os.path.join(self.docs, "old", "page.html")
+        os.makedirs(os.path.dirname(orphan))
+        self.write(orphan, "stale")
+        self.build()
+        self.assertEqual(os.path.getmtime(home), 0)
+        self.assertFalse(os.path.exists(os.path.dirname(orphan)))
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        os.remove(os.path.join(self.static, "index.css"))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "index.css")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_template_change_rebuilds_everything(self):
+        self.build()
+        blog = os.path.join(self.docs, "blog", "index.html")
+        os.utime(blog, (0, 0))
+        self.write(self.template, "<main>{{ Content }}</main>")
+        self.build()
+        with open(blog) as f:
+            self.assertEqual(f.read(), "<main><div><h1>Blog</h1><p>Post</p></div></main>")
+
+    def read_outputs(self):
+        outputs = {}
+        for root, _, names in os.walk(self.docs):
+            for name in names:
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    outputs[os.path.relpath(path, self.docs)] = f.read()
+        return outputs
+
+    def test_parallel_build_matches_serial(self):
+        self.build(clean=True)
+        serial = self.read_outputs()
+        self.build(clean=True, jobs=2)
+        self.assertEqual(self.read_outputs(), serial)
+
+    def test_bad_page_does_not_stop_the_build(self):
+        self.write(os.path.join(self.content, "bad.md"), "# Bad\n\nunclosed **bold")
+        with self.assertRaises(BuildError) as ctx:
+            self.build(jobs=2)
+        self.assertEqual(list(ctx.exception.failures), [os.path.join(self.content, "bad.md")])
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "blog", "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_bad_front_matter_does_not_stop_the_build(self):
+        bad = os.path.join(self.content, "bad.md")
+        unclosed = os.path.join(self.content, "unclosed.md")
+        self.write(bad, "---\nthis is not yaml\n---\n# Bad")
+        self.write(unclosed, "---\ndraft: true\n# Unclosed")
+        with self.assertRaises(BuildError) as ctx:
+            self.build()
+        self.assertEqual(sorted(ctx.exception.failures), [bad, unclosed])
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+        self.assertTrue(os.path.exists(self.manifest))
+        builder = Builder(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaises(BuildError):
+                builder.build()
+            self.assertEqual(sorted(builder.rebuild_paths([bad, unclosed])), [bad, unclosed])
+
+    def test_template_change_reuses_parse_cache(self):
+        self.build()
+        cache = ParseCache(os.path.join(self.root, "cache", "parse"))
+        self.assertEqual(len(cache.entries()), 2)
+        for _, _, path in cache.entries():
+            with open(path, "w") as f:
+                # Entries hold the page's links as a JSON line, then the HTML
+                f.write("[]\n<div>cached</div>")
+        self.write(self.template, "<main>{{ Content }}</main>")
+        self.build()
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertEqual(f.read(), "<main><div>cached</div></main>")
+
+    def test_rebuild_paths_renders_only_changed_page(self):
+        builder = Builder(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        with redirect_stdout(io.StringIO()):
+            builder.build()
+            home = os.path.join(self.docs, "index.html")
+            os.utime(home, (0, 0))
+            post = os.path.join(self.content, "blog", "post.md")
+            self.write(post, "# Post\n\nNew")
+            builder.rebuild_paths([post])
+            self.assertTrue(os.path.exists(os.path.join(self.docs, "blog", "post.html")))
+            self.assertEqual(os.path.getmtime(home), 0)
+            os.remove(post)
+            builder.rebuild_paths([post])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "post.html")))
+        self.assertNotIn(post, builder.manifest["pages"])
+
+    def test_profile_collects_stages_from_workers(self):
+        PROFILER.enable(trace=True)
+        try:
+            self.build(jobs=2)
+            self.assertEqual(PROFILER.totals["page"][1], 2)
+            for stage in ("read", "parse", "inline", "render", "write", "static"):
+                self.assertIn(stage, PROFILER.totals)
+            self.assertEqual(set(PROFILER.pages), {os.path.join(self.content, "index.md"),
+                                                   os.path.join(self.content, "blog", "index.md")})
+            self.assertTrue(all(event["ph"] == "X" for event in PROFILER.events))
+        finally:
+            PROFILER.enabled = False
+            PROFILER.reset()
+
+    def test_streaming_matches_in_memory_page(self):
+        source = os.path.join(self.content, "big.md")
+        self.write(source, "---\nauthor: me\n---\nIntro [link](/a)\n\n# Big\n\n" + "\n\n".join(
+            f"## Part {i}\n\n- **item** {i}\n- [x](/x/{i}) [up](/a)\n\n```\ncode {i}\n\nmore\n```" for i in range(50)))
+        outputs = []
+        links = []
+        for threshold in (1 << 30, 0):
+            output = os.path.join(self.root, f"out-{threshold}.html")
+            with redirect_stdout(io.StringIO()):
+                links.append(generate_page(source, self.template, "/base/", output, streaming_threshold=threshold)["links"])
+            with open(output) as f:
+                outputs.append(f.read())
+        self.assertEqual(outputs[0], outputs[1])
+        # A streamed page keeps each url once, at its first line
+        self.assertEqual(len(links[0]), 101)
+        self.assertEqual(links[1], [link for link in links[0] if link[0] != "/a" or link[1] == 4])
+        self.assertIn("<title>Big</title>", outputs[1])
+        output = os.path.join(self.root, "out-0.html")
+        os.utime(output, (0, 0))
+        with redirect_stdout(io.StringIO()):
+            generate_page(source, self.template, "/base/", output, streaming_threshold=0)
+        self.assertEqual(os.path.getmtime(output), 0)
+        self.assertEqual(os.listdir(self.root).count("out-0.html.ssg-tmp"), 0)
+
+    def test_section_templates_use_the_site_partials_and_data(self):
+        for name in ("partials", "data", "templates"):
+            os.makedirs(os.path.join(self.root, name))
+        self.write(os.path.join(self.root, "partials", "footer.html"), "<footer>{{ site.title }}</footer>")
+        self.write(os.path.join(self.root, "data", "site.json"), '{"title": "Fan Club"}')
+        for section in ("blog", "tags"):
+            self.write(os.path.join(self.root, "templates", section + ".html"), "<main>{{ Content }}</main>{{> footer }}")
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        os.makedirs(os.path.join(self.content, "blog", "post"))
+        self.write(os.path.join(self.content, "blog", "post", "index.md"), "---\ntags: elves\n---\n# Post\n\nText")
+        self.build()
+        for rel in (("blog", "post", "index.html"), ("blog", "index.html"), ("tags", "elves", "index.html"),
+                    ("tags", "index.html")):
+            with open(os.path.join(self.docs, *rel)) as f:
+                self.assertIn("<footer>Fan Club</footer>", f.read())
+
+    def test_section_template_rebuilds_only_its_section(self):
+        section_template = os.path.join(self.root, "templates", "blog.html")
+        os.makedirs(os.path.dirname(section_template))
+        self.write(section_template, "<article>{{ Content }}</article>")
+        self.build()
+        home = os.path.join(self.docs, "index.html")
+        blog = os.path.join(self.docs, "blog", "index.html")
+        os.utime(home, (0, 0))
+        self.write(section_template, "<section>{{ Content }}</section>")
+        self.build()
+        self.assertEqual(os.path.getmtime(home), 0)
+        with open(blog) as f:
+            self.assertEqual(f.read(), "<section><div><h1>Blog</h1><p>Post</p></div></section>")
+        graph = DepGraph.load(os.path.join(self.root, "cache", "deps.json"))
+        self.assertEqual(graph.why(blog)["reason"], f"{section_template} changed")
+        self.assertEqual(graph.dependents(section_template), [blog])
+        self.assertEqual(graph.dependents(self.template), [home])
+
+    def test_new_section_template_and_partial_change(self):
+        os.makedirs(os.path.join(self.root, "partials"))
+        footer = os.path.join(self.root, "partials", "footer.html")
+        self.write(footer, "<footer>v1</footer>")
+        self.write(self.template, "{{ Content }}{{> footer }}")
+        builder = Builder(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        with redirect_stdout(io.StringIO()):
+            builder.build()
+            home = os.path.join(self.docs, "index.html")
+            os.utime(home, (0, 0))
+            os.makedirs(os.path.join(self.root, "templates"))
+            self.write(os.path.join(self.root, "templates", "blog.html"), "<article>{{ Content }}</article>")
+            builder.rebuild_paths([os.path.join(self.root, "templates")])
+            self.assertEqual(os.path.getmtime(home), 0)
+            self.write(footer, "<footer>v2</footer>")
+            builder.rebuild_paths([footer])
+        with open(home) as f:
+            self.assertEqual(f.read(), "<div><h1>Home</h1><p>Hello</p></div><footer>v2</footer>")
+        with open(os.path.join(self.docs, "blog", "index.html")) as f:
+            self.assertEqual(f.read(), "<article><div><h1>Blog</h1><p>Post</p></div></article>")
+
+    def test_sitemap_feed_and_paginated_listing(self):
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        for day in (1, 2, 3):
+            os.makedirs(os.path.join(self.content, "blog", f"post{day}"))
+            self.write(os.path.join(self.content, "blog", f"post{day}", "index.md"),
+                       f"---\ndate: 2024-01-0{day}\n---\n# Post & {day}\n\nText")
+        size = feeds.LISTING_PAGE_SIZE
+        feeds.LISTING_PAGE_SIZE = 2
+        try:
+            self.build(site_url="https://example.org/")
+        finally:
+            feeds.LISTING_PAGE_SIZE = size
+        with open(os.path.join(self.docs, "sitemap.xml")) as f:
+            sitemap = f.read()
+        self.assertIn("<loc>https://example.org/blog/post1/</loc><lastmod>2024-01-01</lastmod>", sitemap)
+        self.assertEqual(sitemap.count("<url>"), 4)
+        with open(os.path.join(self.docs, "feed.xml")) as f:
+            feed = f.read()
+        self.assertIn("<title>Home</title>", feed)
+        self.assertLess(feed.index("Post &amp; 3"), feed.index("Post &amp; 1"))
+        with open(os.path.join(self.docs, "blog", "index.html")) as f:
+            self.assertEqual(f.read(), '<html><title>Blog</title><body><div><ul>'
+                             '<li><a href="/blog/post3/">Post & 3</a></li><li><a href="/blog/post2/">Post & 2</a></li>'
+                             '</ul><nav><a href="/blog/page/2/">Older</a></nav></div></body></html>')
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "blog", "page", "2", "index.html")))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "page")))
+        # Without a site URL there are no absolute URLs to list
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "sitemap.xml")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "feed.xml")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "blog", "index.html")))
+
+    def test_images_get_width_and_height(self):
+        os.makedirs(os.path.join(self.static, "images"))
+        write_png(os.path.join(self.static, "images", "a.png"), 3, 2)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![alt](/images/a.png)")
+        self.build()
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn('<img src="/images/a.png" alt="alt" width="3" height="2"></img>', f.read())
+        self.build(images=False)
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn('<img src="/images/a.png" alt="alt"></img>', f.read())
+
+    def test_image_changes_rerender_only_the_pages_showing_it(self):
+        os.makedirs(os.path.join(self.static, "images"))
+        write_png(os.path.join(self.static, "images", "a.png"), 3, 2)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![alt](/images/a.png)")
+        self.build()
+        def rebuild():
+            out = io.StringIO()
+            with redirect_stdout(out):
+                build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+            return out.getvalue()
+        write_png(os.path.join(self.static, "images", "b.png"), 5, 5)
+        self.assertIn("Pages: 0 written, 2 skipped (0 re-rendered identical)", rebuild())
+        write_png(os.path.join(self.static, "images", "a.png"), 6, 4)
+        self.assertIn("Pages: 1 written, 1 skipped (0 re-rendered identical)", rebuild())
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn('width="6" height="4"', f.read())
+
+    @unittest.skipUnless(images.Image, "Pillow is not installed")
+    def test_image_variants_are_cached_and_referenced(self):
+        os.makedirs(os.path.join(self.static, "images"))
+        images.Image.new("RGB", (1000, 500)).save(os.path.join(self.static, "images", "a.png"))
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![alt](/images/a.png)")
+        self.build()
+        with open(os.path.join(self.docs, "index.html")) as f:
+            html = f.read()
+        self.assertIn('srcset="/images/a-480w.png 480w, /images/a-960w.png 960w, /images/a.png 1000w"', html)
+        self.assertEqual(images.image_size(os.path.join(self.docs, "images", "a-480w.png")), (480, 240))
+        out = io.StringIO()
+        with redirect_stdout(out):
+            build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, clean=True,
+                       cache_dir=None)
+        self.assertIn("0 variants generated, 2 cached", out.getvalue())
+
+    def test_minify_pages_and_css(self):
+        self.write(self.template, "<html>\n  <title>{{ Title }}</title>\n  <body>\n    {{ Content }}\n  </body>\n</html>\n")
+        self.write(os.path.join(self.static, "index.css"), "/* site */\nbody {\n  margin: 0 auto;\n}\n")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None,
+                       minify=True)
+        self.assertIn("Minified css: 1 files", out.getvalue())
+        self.assertIn("Minified html: 2 files", out.getvalue())
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertEqual(f.read(), "<html><title>Home</title><body><div><h1>Home</h1><p>Hello</p></div></body></html>")
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body{margin:0 auto}")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        self.assertIn("minify setting changed", out.getvalue())
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertIn("/* site */", f.read())
+
+    def test_daemon_rebuilds_in_memory_and_saves_later(self):
+        with redirect_stdout(io.StringIO()):
+            builder = Builder(self.content, self.template, self.static, "/", self.docs, self.manifest,
+                              cache_dir=os.path.join(self.root, "cache", "parse"))
+            builder.build()
+            daemon = BuildDaemon(builder)
+            saved = os.path.getmtime(self.manifest)
+            os.utime(self.manifest, (0, 0))
+            self.write(os.path.join(self.content, "index.md"), "# Home\n\nPublished")
+            socket_path = os.path.join(self.root, "daemon.sock")
+            server = create_server(daemon, socket_path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                response = send({"command": "rebuild", "paths": [os.path.join(self.content, "index.md")]}, socket_path)
+                error = send({"command": "rebuild", "paths": []}, socket_path)
+            finally:
+                server.shutdown()
+                server.server_close()
+            self.assertTrue(response["ok"])
+            self.assertEqual(response["pages"], 2)
+            self.assertIn("non-empty", error["error"])
+            with open(os.path.join(self.docs, "index.html")) as f:
+                self.assertIn("Published", f.read())
+            self.assertEqual(os.path.getmtime(self.manifest), 0)
+            self.assertEqual(_respond(daemon, {"command": "rebuild", "paths": [1]})[0], 400)
+            self.assertEqual(_respond(daemon, {"command": "publish"})[0], 400)
+            def broken(paths, save=True):
+                raise TypeError("not a request problem")
+            builder.rebuild_paths = broken
+            self.assertEqual(_respond(daemon, {"command": "rebuild", "paths": ["x"]})[0], 500)
+            daemon.stop()
+        self.assertGreaterEqual(os.path.getmtime(self.manifest), saved)
+
+    def test_broken_links_are_reported_with_lines(self):
+        os.makedirs(os.path.join(self.static, "images"))
+        write_png(os.path.join(self.static, "images", "a.png"), 1, 1)
+        self.write(os.path.join(self.content, "index.md"),
+                   "---\ndate: 2024-01-01\n---\n# Home\n\n[blog](/blog) [css](/index.css) [out](https://example.org)\n"
+                   "![ok](images/a.png)\n\n- [gone](/blog/gone#top)\n- ![missing](/images/b.png)")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        index = os.path.join(self.content, "index.md")
+        self.assertIn(f"Warning: {index}:9: broken link to /blog/gone#top", out.getvalue())
+        self.assertIn(f"Warning: {index}:10: broken link to /images/b.png", out.getvalue())
+        self.assertIn("Links: 5 internal links checked, 2 broken", out.getvalue())
+        with self.assertRaises(BuildError) as ctx:
+            self.build(links="error")
+        self.assertEqual(ctx.exception.failures, {index: "broken link to /blog/gone#top on line 9"})
+
+    def test_drafts_are_left_out_unless_asked_for(self):
+        draft = os.path.join(self.content, "blog", "draft.md")
+        self.write(draft, "---\ndraft: true\n---\n# Draft\n\nSoon")
+        manifest = self.build()
+        self.assertNotIn(draft, manifest["pages"])
+        self.assertEqual(manifest["drafts"][draft]["meta"]["Title"], "Draft")
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "draft.html")))
+        self.build(drafts=True)
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "blog", "draft.html")))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "draft.html")))
+        builder = Builder(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        with redirect_stdout(io.StringIO()):
+            builder.build()
+            self.write(draft, "# Draft\n\nPublished")
+            builder.rebuild_paths([draft])
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "blog", "draft.html")))
+        self.assertNotIn(draft, builder.manifest["drafts"])
+
+    def test_tag_pages_update_only_when_membership_changes(self):
+        for day, tags in ((1, "[elves, rings]"), (2, "elves"), (3, "[Rings]")):
+            os.makedirs(os.path.join(self.content, "blog", f"post{day}"))
+            self.write(os.path.join(self.content, "blog", f"post{day}", "index.md"),
+                       f"---\ndate: 2024-01-0{day}\ntags: {tags}\n---\n# Post {day}\n\nText")
+        self.build()
+        elves = os.path.join(self.docs, "tags", "elves", "index.html")
+        rings = os.path.join(self.docs, "tags", "rings", "index.html")
+        with open(elves) as f:
+            self.assertEqual(f.read(), '<html><title>Tag: elves</title><body><div><ul>'
+                             '<li><a href="/blog/post2/">Post 2</a></li><li><a href="/blog/post1/">Post 1</a></li>'
+                             '</ul></div></body></html>')
+        with open(os.path.join(self.docs, "tags", "index.html")) as f:
+            self.assertIn('<li><a href="/tags/rings/">rings (2)</a></li>', f.read())
+        os.utime(elves, (0, 0))
+        os.utime(rings, (0, 0))
+        self.write(os.path.join(self.content, "blog", "post3", "index.md"),
+                   "---\ndate: 2024-01-03\ntags: [dwarves]\n---\n# Post 3\n\nText")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            build_site(self.content, self.template, self.static, "/", self.docs, self.manifest, cache_dir=None)
+        self.assertIn("Taxonomies: 3 tags (2 rendered, 0 pages removed)", out.getvalue())
+        self.assertEqual(os.path.getmtime(elves), 0)
+        with open(rings) as f:
+            self.assertNotIn("Post 3", f.read())
+        self.write(os.path.join(self.content, "blog", "post3", "index.md"), "# Post 3\n\nUntagged")
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "tags", "dwarves")))
+
+    def test_content_page_keeps_the_tags_index(self):
+        os.makedirs(os.path.join(self.content, "tags"))
+        self.write(os.path.join(self.content, "tags", "index.md"), "# All tags\n\nHand written")
+        self.write(os.path.join(self.content, "blog", "index.md"), "---\ntags: elves\n---\n# Blog\n\nPost")
+        self.build()
+        self.build()
+        with open(os.path.join(self.docs, "tags", "index.html")) as f:
+            self.assertIn("Hand written", f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "tags", "elves", "index.html")))
+        self.assertTrue(os.path.exists(self.manifest))
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("content")
+        for path in ("template.html", os.path.join("content", "index.md")):
+            with open(path, "w") as f:
+                f.write("x")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def check(self, watcher):
+        try:
+            for path in ("template.html", os.path.join("content", "index.md")):
+                with open(path, "w") as f:
+                    f.write("changed")
+                os.utime(path, ns=(0, 0))
+                self.assertEqual(watcher.wait(timeout=2), {path})
+        finally:
+            watcher.close()
+
+    def test_inotify_reports_a_single_file_in_the_cwd(self):
+        try:
+            watcher = InotifyWatcher(["content", "template.html"])
+        except (OSError, AttributeError) as e:
+            self.skipTest(f"inotify unavailable: {e}")
+        self.check(watcher)
+
+    def test_polling(self):
+        self.check(PollingWatcher(["content", "template.html"], interval=0.01))
+
+class TestMinify(unittest.TestCase):
+    def test_html_keeps_preformatted_text_and_inline_spaces(self):
+        html = '<p>a <b>b</b>  <i>c</i>\n</p>\n<pre>  x\n  y</pre>  <div  class = "a  b"   id=x >t</div>'
+        self.assertEqual(minify_html(html), '<p>a <b>b</b> <i>c</i></p><pre>  x\n  y</pre><div class="a  b" id=x>t</div>')
+
+    def test_html_leaves_text_that_is_not_a_tag(self):
+        self.assertEqual(minify_html("<p>1 < 2\n  and 3 > 2</p>"), "<p>1 < 2 and 3 > 2</p>")
+
+    def test_css(self):
+        css = 'a:hover > b ,\ni { content: "x  ;}" ; color : red; }\n/* gone */\np{margin:0 auto;}'
+        self.assertEqual(minify_css(css), 'a:hover>b,i{content:"x  ;}";color :red}p{margin:0 auto}')
+
+class TestStaticSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        for rel in ("index.css", os.path.join("images", "a.png")):
+            with open(os.path.join(self.static, rel), "w") as f:
+                f.write(rel)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, old, link=True):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            new = sync_static(self.static, self.docs, old, link=link)
+        return new, out.getvalue()
+
+    def test_copies_then_skips_unchanged(self):
+        first, report = self.sync({})
+        self.assertIn("2 copied", report)
+        _, report = self.sync(first)
+        self.assertIn("0 copied (0 B), 2 skipped", report)
+
+    def test_changed_file_is_recopied_without_links(self):
+        first, _ = self.sync({}, link=False)
+        css = os.path.join(self.static, "index.css")
+        with open(css, "w") as f:
+            f.write("body { color: red }")
+        os.utime(css, ns=(1, 1))
+        _, report = self.sync(first, link=False)
+        self.assertIn("1 copied", report)
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body { color: red }")
+
+    def test_orphans_are_removed(self):
+        first, _ = self.sync({})
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        _, report = self.sync(first)
+        self.assertIn("1 removed", report)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "content")
+        os.makedirs(os.path.join(self.root, "blog", "tom"))
+        for rel in ("index.md", os.path.join("blog", "tom", "index.md")):
+            with open(os.path.join(self.root, rel), "w") as f:
+                f.write(rel)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_walk_lists_files_sorted_with_signatures(self):
+        files = walk_files(self.root)
+        self.assertEqual(list(files), [os.path.join("blog", "tom", "index.md"), "index.md"])
+        self.assertEqual(files["index.md"][0], len("index.md"))
+
+    def test_hashes_survive_a_reload_until_the_file_changes(self):
+        path = os.path.join(self.tmp.name, "files.json")
+        index = FileIndex()
+        index.scan(self.root)
+        digest = index.hash(self.root, "index.md")
+        index.save(path)
+        index = FileIndex.load(path)
+        index.scan(self.root)
+        self.assertEqual(index.roots[self.root]["index.md"][2], digest)
+        with open(os.path.join(self.root, "index.md"), "w") as f:
+            f.write("changed")
+        index.scan(self.root)
+        self.assertIsNone(index.roots[self.root]["index.md"][2])
+        self.assertNotEqual(index.hash(self.root, "index.md"), digest)
+
+class TestIOPipeline(unittest.TestCase):
+    def test_prefetch_keeps_order_and_reports_write_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"{i}.md") for i in range(20)]
+            for i, path in enumerate(paths):
+                with open(path, "w") as f:
+                    f.write("x" * i)
+            pipeline = IOPipeline(threads=2, max_size=15)
+            texts = [future.result() for future in pipeline.prefetch(paths)]
+            self.assertEqual(texts, ["x" * i for i in range(15)] + [None] * 5)
+            for i in range(10):
+                pipeline.write(os.path.join(tmp, f"{i}.html"), str(i))
+            missing = os.path.join(tmp, "missing", "page.html")
+            pipeline.write(missing, "lost")
+            self.assertEqual(list(pipeline.close()), [missing])
+            with open(os.path.join(tmp, "9.html")) as f:
+                self.assertEqual(f.read(), "9")
+
+class TestImageSize(unittest.TestCase):
+    def test_reads_png_gif_and_jpeg_headers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            png = os.path.join(tmp, "a.png")
+            write_png(png, 7, 5)
+            gif = os.path.join(tmp, "a.gif")
+            with open(gif, "wb") as f:
+                f.write(b"GIF89a" + struct.pack("<HH", 640, 480) + b"\0" * 20)
+            jpeg = os.path.join(tmp, "a.jpg")
+            with open(jpeg, "wb") as f:
+                f.write(b"\xff\xd8" + b"\xff\xe0" + struct.pack(">H", 4) + b"JF"
+                        + b"\xff\xc0" + struct.pack(">HBHH", 11, 8, 300, 400) + b"\0" * 6)
+            text = os.path.join(tmp, "a.txt")
+            with open(text, "w") as f:
+                f.write("not an image")
+            self.assertEqual(images.image_size(png), (7, 5))
+            self.assertEqual(images.image_size(gif), (640, 480))
+            self.assertEqual(images.image_size(jpeg), (400, 300))
+            self.assertIsNone(images.image_size(text))
+
+class TestParseCache(unittest.TestCase):
+    def test_prune_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp, max_bytes=10)
+            keys = [cache.key(text, "v1") for text in ("a", "b", "c")]
+            for i, key in enumerate(keys):
+                cache.put(key, "12345")
+                os.utime(cache.path_for(key), ns=(i, i))
+            cache.get(keys[0])
+            self.assertEqual(cache.prune(), 1)
+            self.assertIsNotNone(cache.get(keys[0]))
+            self.assertIsNone(cache.get(keys[1]))
+            self.assertIsNotNone(cache.get(keys[2]))
+
+if __name__ == "__main__":
+    unittest.main()
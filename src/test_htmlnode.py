@@ -1,5 +1,6 @@
+import io
 import unittest
-from functions import text_node_to_html_node, split_nodes_delimiter, extract_markdown_images, split_nodes_image, split_nodes_link, text_to_text_nodes, markdown_to_blocks, block_to_block_type, markdown_to_html_node, extract_title
+from functions import text_node_to_html_node, tokenize_inline, text_to_children, split_nodes_delimiter, extract_markdown_images, split_nodes_image, split_nodes_link, text_to_text_nodes, markdown_to_blocks, scan_blocks, block_to_block_type, markdown_to_html_node, extract_title
 from htmlnode import HTMLNode, LeafNode, ParentNode
 from textnode import TextNode, TextType, BlockType
 
@@ -67,6 +68,24 @@ class TestHTMLNode(unittest.TestCase):
         self.assertEqual(node.to_html(),
                          '<p><span><p>Paragraph text</p>Normal text</span>Normal text<h1>Header</h1><div><a href="google.com">link</a>Normal text</div>Normal text</p>')
         
+    def test_write_html_streams_fragments(self):
+        node = ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")], {"class": "x"})
+        sink = io.StringIO()
+        node.write_html(sink)
+        self.assertEqual(sink.getvalue(), '<p class="x"><b>bold</b> text</p>')
+        self.assertEqual(list(node.iter_html()), ['<p class="x">', "<b>", "bold", "</b>", " text", "</p>"])
+
+    def test_to_html_deeply_nested(self):
+        node = LeafNode(None, "x")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        self.assertEqual(node.to_html(), "<span>" * 5000 + "x" + "</span>" * 5000)
+
+    def test_nodes_are_slotted(self):
+        for node in (HTMLNode("p"), LeafNode("b", "x"), ParentNode("p", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(repr(LeafNode("a", "x", {"href": "/"})), "tag: a, value: x, children: None, props: {'href': '/'}")
+
     def test_text(self):
         node = TextNode("This is a text node", TextType.TEXT)
         html_node = text_node_to_html_node(node)
@@ -349,6 +368,35 @@ class TestHTMLNode(unittest.TestCase):
             new_nodes
         )
 
+    def test_tokenize_inline_matches_split_chain(self):
+        text = "This is **text** with an _italic_ word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+        node = TextNode(text, TextType.TEXT)
+        old_nodes = split_nodes_delimiter([node], "**", TextType.BOLD)
+        old_nodes = split_nodes_delimiter(old_nodes, "_", TextType.ITALIC)
+        old_nodes = split_nodes_delimiter(old_nodes, "`", TextType.CODE)
+        old_nodes = split_nodes_link(split_nodes_image(old_nodes))
+        self.assertListEqual(tokenize_inline(text), old_nodes)
+
+    def test_tokenize_inline_code_and_urls_are_literal(self):
+        self.assertListEqual(tokenize_inline("call `snake_case_name` at [docs](https://x.dev/a_b)"), [
+            TextNode("call ", TextType.TEXT),
+            TextNode("snake_case_name", TextType.CODE),
+            TextNode(" at ", TextType.TEXT),
+            TextNode("docs", TextType.LINK, "https://x.dev/a_b"),
+        ])
+
+    def test_tokenize_inline_unclosed_delimiter(self):
+        with self.assertRaises(Exception) as ctx:
+            tokenize_inline("this **never closes")
+        self.assertIn("Invalid markdown syntax", str(ctx.exception))
+
+    def test_bold_inside_link(self):
+        nodes = text_to_children("see [the **bold** docs](/docs) and **[x](/y)**")
+        self.assertEqual(
+            "".join(node.to_html() for node in nodes),
+            'see <a href="/docs">the <b>bold</b> docs</a> and <b><a href="/y">x</a></b>',
+        )
+
     def test_markdown_to_blocks(self):
         md = """
 This is **bolded** paragraph
@@ -382,6 +430,13 @@ This is the same paragraph on a new line
     def test_block_to_block_type_paragraph(self):
         self.assertEqual(block_to_block_type("just some text"), BlockType.PARAGRAPH)
 
+    def test_block_to_block_type_first_character_and_fallback(self):
+        self.assertEqual(block_to_block_type("01. a\n02. b\n3. c"), BlockType.ORDERED_LIST)
+        self.assertEqual(block_to_block_type("- a\n-b"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("> a\n>b\nc"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("#hashtag"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("  > a\n> b  "), BlockType.QUOTE)
+
     def test_paragraphs(self):
         md = """
 # Main header
@@ -426,6 +481,25 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_codeblock_with_blank_lines(self):
+        md = "Intro\n```python\ndef f():\n\n    return 1\n```\nAfter"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p>Intro</p><pre><code>def f():\n\n    return 1\n</code></pre><p>After</p></div>",
+        )
+
+    def test_scan_blocks_types_and_lines(self):
+        md = "# Title\n\n- a\n- b\n\n1. Mr. Frodo\n2. Sam\n\n> quote\ntext\n\n```\nx\n```"
+        blocks = [(block_type, start) for block_type, _, start in scan_blocks(md.split("\n"))]
+        self.assertEqual(blocks, [
+            (BlockType.HEADING, 1),
+            (BlockType.UNORDERED_LIST, 3),
+            (BlockType.ORDERED_LIST, 6),
+            (BlockType.PARAGRAPH, 9),
+            (BlockType.CODE, 12),
+        ])
+        self.assertIn("<li>Mr. Frodo</li>", markdown_to_html_node(md).to_html())
+
     def test_extract_title_markdown(self):
         test_string = extract_title("# Hello\nJazda jazda jazda jazda")
         self.assertEqual(test_string, "Hello")
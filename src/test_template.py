@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+from frontmatter import parse_front_matter, load_metadata
+from htmlnode import LeafNode, ParentNode
+from template import Template, load_template
+
+class TestTemplate(unittest.TestCase):
+    def test_render_variables(self):
+        template = Template("<title>{{ Title }}</title>{{Content}} by {{ author }}")
+        self.assertEqual(template.names(), ["Title", "Content", "author"])
+        html = template.render({"Title": "Hi", "Content": "<p>x</p>", "author": "me"})
+        self.assertEqual(html, "<title>Hi</title><p>x</p> by me")
+
+    def test_unknown_placeholder_is_kept(self):
+        template = Template("{{ Title }} {{ missing }}")
+        self.assertEqual(template.render({"Title": "Hi"}), "Hi {{ missing }}")
+
+    def test_basepath_rewrites_attributes_only(self):
+        template = Template('<link href="/index.css"><a href="https://x.dev">{{ Content }}</a>', "/site/")
+        content = ParentNode("p", [
+            LeafNode("a", 'href="/literal"', {"href": "/blog"}),
+            LeafNode("img", "", {"src": "//cdn.dev/x.png", "alt": "/a"}),
+        ])
+        self.assertEqual(
+            template.render({"Content": content}),
+            '<link href="/site/index.css"><a href="https://x.dev"><p><a href="/site/blog">href="/literal"</a>'
+            '<img src="//cdn.dev/x.png" alt="/a"></img></p></a>',
+        )
+
+    def test_load_template_is_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write("one {{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+            with open(path, "w") as f:
+                f.write("two {{ Title }}")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(load_template(path).render({"Title": "x"}), "two x")
+
+    def test_partials_and_data_are_dependencies(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "partials"))
+            path = os.path.join(tmp, "template.html")
+            header = os.path.join(tmp, "partials", "header.html")
+            data = os.path.join(tmp, "data", "site.json")
+            with open(path, "w") as f:
+                f.write("{{> header }}{{ Content }}")
+            with open(header, "w") as f:
+                f.write("<h1>{{ site.title }}</h1>")
+            template = load_template(path)
+            self.assertEqual(template.dependencies, [path, header, data])
+            self.assertEqual(template.render({"Content": "x"}), "<h1>{{ site.title }}</h1>x")
+            os.makedirs(os.path.dirname(data))
+            with open(data, "w") as f:
+                f.write('{"title": "Tolkien Fan Club"}')
+            self.assertEqual(load_template(path).render({"Content": "x"}), "<h1>Tolkien Fan Club</h1>x")
+
+    def test_recursive_partial_is_an_error(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "partials"))
+            with open(os.path.join(tmp, "partials", "loop.html"), "w") as f:
+                f.write("{{> loop }}")
+            with self.assertRaises(Exception):
+                Template("{{> loop }}", root=tmp)
+
+    def test_parse_front_matter(self):
+        metadata, body = parse_front_matter('---\nauthor: "Bilbo"\nlayout: post\n---\n# Title')
+        self.assertEqual(metadata, {"author": "Bilbo", "layout": "post"})
+        self.assertEqual(body, "# Title")
+
+    def test_yaml_style_front_matter(self):
+        metadata, body = parse_front_matter(
+            "---\n"
+            "date: 2024-03-01\n"
+            "draft: false  # not yet\n"
+            "weight: 3\n"
+            "tags: [elves, 'first age', \"a, b\"]\n"
+            "authors:\n"
+            "  - Bilbo\n"
+            "  - Frodo\n"
+            "cover:\n"
+            "  image: /images/tom.png\n"
+            "  alt: Tom\n"
+            "summary: >\n"
+            "  Old Forest\n"
+            "  songs\n"
+            "empty:\n"
+            "---\n"
+            "# Title")
+        self.assertEqual(metadata, {
+            "date": "2024-03-01", "draft": False, "weight": 3, "tags": ["elves", "first age", "a, b"],
+            "authors": ["Bilbo", "Frodo"], "cover": {"image": "/images/tom.png", "alt": "Tom"},
+            "summary": "Old Forest songs", "empty": "",
+        })
+        self.assertEqual(body, "# Title")
+
+    def test_trailing_comments(self):
+        metadata, _ = parse_front_matter(
+            "---\n"
+            "tags: [x, 'y # z'] # note\n"
+            "title: \"Quoted # kept\" # c\n"
+            "author: Don't panic # c\n"
+            "url: /a#b\n"
+            "---\n"
+            "# Title")
+        self.assertEqual(metadata, {"tags": ["x", "y # z"], "title": "Quoted # kept", "author": "Don't panic",
+                                    "url": "/a#b"})
+
+    def test_invalid_front_matter(self):
+        with self.assertRaises(Exception):
+            parse_front_matter("---\n  - orphan item\n---\n# Title")
+        with self.assertRaises(Exception):
+            parse_front_matter("---\ntitle: x\n# Title")
+
+    def test_load_metadata_stops_at_the_title(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "w") as f:
+                f.write("---\ndraft: true\ntags: [a]\n---\n\n# Tom Bombadil\n\nunclosed **bold")
+            self.assertEqual(load_metadata(path), {"draft": True, "tags": ["a"], "Title": "Tom Bombadil"})
+
+    def test_no_front_matter(self):
+        self.assertEqual(parse_front_matter("# Title\n---"), ({}, "# Title\n---"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,6 +29,10 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a bold text node", TextType.BOLD)
         self.assertEqual(node, node2)
 
+    def test_slotted(self):
+        node = TextNode("text", TextType.LINK, "url")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(repr(node), "TextNode(text, a, url)")
 
 
 if __name__ == "__main__":
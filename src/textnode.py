@@ -17,6 +17,8 @@ class BlockType(Enum):
     ORDERED_LIST = "ol"
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url = None):
         self.text = text
         self.text_type = text_type